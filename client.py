@@ -1,21 +1,43 @@
 from __future__ import annotations
 
+import base64
 import configparser
+import functools
 import json
 import os
-import secrets
+import signal
 import threading
+import weakref
+from collections import deque
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
-from flask import Flask, redirect, render_template_string, request, session, url_for
+from flask import Flask, Response, redirect, request, session, url_for
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    # Optional here: the client only requires flask + requests.
+    orjson = None
+
+# Decoder for the streamed chunks, each carrying the whole partial response.
+_loads: Callable[[str | bytes], Any] = orjson.loads if orjson is not None else json.loads
 
 
 ROOT = Path(__file__).resolve().parent
-_STORE_LOCK = threading.Lock()
-_MESSAGE_STORE: dict[str, list[dict[str, str]]] = {}
+_MAX_MSGS = 80
+# One bounded deque per session; each session has its own lock so users don't contend with each other.
+_MESSAGE_STORE: dict[str, deque[dict[str, str]]] = {}
+_SID_LOCKS: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+_SID_LOCKS_GUARD = threading.Lock()
+_CFG_LOCK = threading.Lock()
+
+# Shared keep-alive pool to the API server (avoids a new TCP connection per /send).
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
 
 
 @dataclass(frozen=True)
@@ -24,7 +46,58 @@ class ApiConfig:
     api_key: str | None
 
 
-def load_api_config(path: Path) -> ApiConfig:
+_CFG_CACHE: tuple[tuple[Any, ...], ApiConfig] | None = None
+
+
+# Session ids are cut from a pooled urandom buffer: one getrandom() per 128 new sessions.
+_ENTROPY = bytearray(os.urandom(2048))
+_ENTROPY_OFF = 0
+_ENTROPY_LOCK = threading.Lock()
+
+
+def _new_sid() -> str:
+    global _ENTROPY_OFF
+    with _ENTROPY_LOCK:
+        if _ENTROPY_OFF + 16 > len(_ENTROPY):
+            _reseed_entropy()
+        chunk = bytes(_ENTROPY[_ENTROPY_OFF:_ENTROPY_OFF + 16])
+        # Wipe used bytes so past ids cannot be read back from the pool.
+        _ENTROPY[_ENTROPY_OFF:_ENTROPY_OFF + 16] = bytes(16)
+        _ENTROPY_OFF += 16
+    return base64.urlsafe_b64encode(chunk).rstrip(b"=").decode("ascii")
+
+
+def _reseed_entropy() -> None:
+    global _ENTROPY_OFF
+    _ENTROPY[:] = os.urandom(2048)
+    _ENTROPY_OFF = 0
+
+
+def _after_fork_in_child() -> None:
+    # Another thread may have held any of the module locks at fork time; the child gets fresh ones.
+    global _ENTROPY_LOCK, _SID_LOCKS, _SID_LOCKS_GUARD, _CFG_LOCK
+    _ENTROPY_LOCK = threading.Lock()
+    _SID_LOCKS = weakref.WeakValueDictionary()
+    _SID_LOCKS_GUARD = threading.Lock()
+    _CFG_LOCK = threading.Lock()
+    _reseed_entropy()
+
+
+if hasattr(os, "register_at_fork"):
+    # Forked workers (gunicorn --preload) must not hand out the parent's remaining pool.
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _sid_lock(sid: str) -> threading.Lock:
+    with _SID_LOCKS_GUARD:
+        lock = _SID_LOCKS.get(sid)
+        if lock is None:
+            lock = threading.Lock()
+            _SID_LOCKS[sid] = lock
+        return lock
+
+
+def _parse_api_config(path: Path) -> ApiConfig:
     cp = configparser.ConfigParser()
     cp.read(path, encoding="utf-8")
 
@@ -39,13 +112,88 @@ def load_api_config(path: Path) -> ApiConfig:
     return ApiConfig(base_url=f"http://{ip}:{port}", api_key=api_key)
 
 
-def api_post_ask(cfg: ApiConfig, prompt: str, new_chat: bool, timeout_s: float) -> dict[str, Any]:
+def load_api_config(path: Path) -> ApiConfig:
+    # Reparse only when the file (or the env override) changed; a stat is much cheaper than ConfigParser.
+    global _CFG_CACHE
+    try:
+        st = os.stat(path)
+        key: tuple[Any, ...] = (str(path), st.st_mtime_ns, st.st_size)
+    except OSError:
+        key = (str(path), None, None)
+    key += (os.environ.get("COMET_AUTO_API_KEY", ""),)
+
+    with _CFG_LOCK:
+        cached = _CFG_CACHE
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    cfg = _parse_api_config(path)
+    with _CFG_LOCK:
+        _CFG_CACHE = (key, cfg)
+    return cfg
+
+
+def _clear_api_config_cache() -> None:
+    # A single atomic assignment, deliberately without _CFG_LOCK: this runs from the SIGHUP handler, which
+    # interrupts the main thread and would deadlock on the non-reentrant lock if it held it.
+    global _CFG_CACHE
+    _CFG_CACHE = None
+
+
+load_api_config.cache_clear = _clear_api_config_cache  # type: ignore[attr-defined]
+
+
+@functools.lru_cache(maxsize=8)
+def _api_headers(cfg: ApiConfig) -> dict[str, str]:
     headers = {"Content-Type": "application/json"}
     if cfg.api_key:
         headers["Authorization"] = f"Bearer {cfg.api_key}"
+    return headers
+
+
+def _read_sse(r: requests.Response, on_partial: Callable[[str], None]) -> dict[str, Any]:
+    # Only a final chunk (completed) or an error ends the exchange; partials are progress, not an answer.
+    partial = ""
+    for line in r.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        try:
+            chunk = _loads(line[5:].strip())
+        except Exception:
+            continue
+        if not isinstance(chunk, dict):
+            continue
+        if not chunk.get("ok") or chunk.get("completed"):
+            return chunk
+        partial = str(chunk.get("response") or "")
+        on_partial(partial)
+    data: dict[str, Any] = {"ok": False, "error": "Stream cerrado sin respuesta"}
+    if partial:
+        data["partial"] = partial
+    return data
 
+
+def api_post_ask(
+    cfg: ApiConfig,
+    prompt: str,
+    new_chat: bool,
+    timeout_s: float,
+    on_partial: Callable[[str], None] | None = None,
+) -> dict[str, Any]:
     payload = {"prompt": prompt, "new_chat": bool(new_chat), "timeout_s": float(timeout_s)}
-    r = requests.post(f"{cfg.base_url}/ask", json=payload, headers=headers, timeout=float(timeout_s) + 20.0)
+    headers = _api_headers(cfg)
+    if on_partial is not None:
+        headers = {**headers, "Accept": "text/event-stream"}
+    r = _SESSION.post(
+        f"{cfg.base_url}/ask",
+        json=payload,
+        headers=headers,
+        timeout=float(timeout_s) + 20.0,
+        stream=on_partial is not None,
+    )
+    if on_partial is not None and r.ok and "text/event-stream" in r.headers.get("Content-Type", ""):
+        with r:
+            return _read_sse(r, on_partial)
     try:
         data = r.json()
     except Exception:
@@ -131,47 +279,98 @@ HTML = """<!doctype html>
 
 
 def create_app() -> Flask:
-    cfg = load_api_config(ROOT / "config.conf")
+    cfg_path = ROOT / "config.conf"
+    load_api_config(cfg_path)  # warm the cache at startup
     app = Flask(__name__)
     app.secret_key = os.environ.get("COMET_AUTO_CLIENT_SECRET", "dev-secret-change-me")
+    # Parse the page template once instead of on every GET.
+    index_tpl = app.jinja_env.from_string(HTML)
+    empty_pages: dict[tuple[ApiConfig, str], bytes] = {}
 
     def _sid() -> str:
         sid = str(session.get("sid") or "")
         if not sid:
-            sid = secrets.token_urlsafe(16)
+            sid = _new_sid()
             session["sid"] = sid
         return sid
 
-    def _msgs() -> list[dict[str, str]]:
+    def _msgs() -> tuple[dict[str, str], ...]:
         sid = _sid()
-        with _STORE_LOCK:
-            return list(_MESSAGE_STORE.get(sid, []))
-
-    def _set_msgs(msgs: list[dict[str, str]]) -> None:
+        with _sid_lock(sid):
+            return tuple(_MESSAGE_STORE.get(sid, ()))
+
+    def _append_msg(role: str, text: str, replace_last: bool = False) -> None:
+        # Only the new entry is sanitized; stored entries are already clean and maxlen evicts the oldest.
+        role = "user" if role == "user" else "bot"
+        text = (text or "").strip()
+        if len(text) > 8000:
+            text = text[:8000] + "\n…(truncado)…"
+        sid = _sid()
+        with _sid_lock(sid):
+            msgs = _MESSAGE_STORE.get(sid)
+            if msgs is None:
+                msgs = _MESSAGE_STORE[sid] = deque(maxlen=_MAX_MSGS)
+            if replace_last and msgs and msgs[-1]["role"] == role:
+                msgs[-1] = {"role": role, "text": text}
+            else:
+                msgs.append({"role": role, "text": text})
+
+    def _drop_last(role: str) -> None:
         sid = _sid()
-        # Prevent unbounded memory growth
-        trimmed: list[dict[str, str]] = []
-        for m in msgs[-80:]:
-            role = "user" if m.get("role") == "user" else "bot"
-            text = (m.get("text") or "").strip()
-            if len(text) > 8000:
-                text = text[:8000] + "\n…(truncado)…"
-            trimmed.append({"role": role, "text": text})
-        with _STORE_LOCK:
-            _MESSAGE_STORE[sid] = trimmed
+        with _sid_lock(sid):
+            msgs = _MESSAGE_STORE.get(sid)
+            if msgs and msgs[-1]["role"] == role:
+                msgs.pop()
+
+    def _redirect_with(notice: str, notice_ok: bool, **extra: Any) -> Any:
+        # Single write of everything the next GET / needs.
+        session.update({"notice": notice, "notice_ok": notice_ok, **extra})
+        return redirect(url_for("index"))
 
     @app.get("/")
     def index() -> str:
-        return render_template_string(
-            HTML,
+        # Per-request lookup is a stat() thanks to the cache, and picks up config.conf edits.
+        cfg = load_api_config(cfg_path)
+        s = dict(session)
+        for key in ("notice", "notice_ok", "draft"):
+            if key in s:
+                session.pop(key)
+        messages = _msgs()
+
+        # Fresh tab (no history, no notice, default form): serve the pre-rendered page.
+        is_empty_state = (
+            not messages
+            and not s.get("notice")
+            and not s.get("draft")
+            and not s.get("new_chat")
+            and float(s.get("timeout_s", 120.0)) == 120.0
+        )
+        if is_empty_state:
+            key = (cfg, request.script_root)
+            page = empty_pages.get(key)
+            if page is None:
+                page = index_tpl.render(
+                    api_base=cfg.base_url,
+                    api_key=bool(cfg.api_key),
+                    messages=(),
+                    notice="",
+                    notice_ok=False,
+                    draft="",
+                    new_chat=False,
+                    timeout_s=120.0,
+                ).encode("utf-8")
+                empty_pages[key] = page
+            return Response(page, mimetype="text/html")
+
+        return index_tpl.render(
             api_base=cfg.base_url,
             api_key=bool(cfg.api_key),
-            messages=_msgs(),
-            notice=session.pop("notice", ""),
-            notice_ok=bool(session.pop("notice_ok", False)),
-            draft=session.pop("draft", ""),
-            new_chat=bool(session.get("new_chat", False)),
-            timeout_s=float(session.get("timeout_s", 120.0)),
+            messages=messages,
+            notice=s.get("notice", ""),
+            notice_ok=bool(s.get("notice_ok", False)),
+            draft=s.get("draft", ""),
+            new_chat=bool(s.get("new_chat", False)),
+            timeout_s=float(s.get("timeout_s", 120.0)),
         )
 
     @app.post("/send")
@@ -179,48 +378,52 @@ def create_app() -> Flask:
         prompt = (request.form.get("prompt") or "").strip()
         new_chat = bool(request.form.get("new_chat"))
         timeout_s = float(request.form.get("timeout_s") or 120.0)
-        session["new_chat"] = new_chat
-        session["timeout_s"] = timeout_s
-        session["draft"] = ""
+        prefs = {"new_chat": new_chat, "timeout_s": timeout_s, "draft": ""}
 
         if not prompt:
-            session["notice"] = "prompt vacío"
-            session["notice_ok"] = False
-            return redirect(url_for("index"))
+            return _redirect_with("prompt vacío", False, **prefs)
 
-        msgs = _msgs()
-        msgs.append({"role": "user", "text": prompt})
-        _set_msgs(msgs)
+        _append_msg("user", prompt)
 
+        # Partial answers are shown as a provisional bot bubble that gets replaced as the stream advances.
+        partial_shown = False
+
+        def _put_bot(text: str | None) -> None:
+            nonlocal partial_shown
+            if text is not None:
+                _append_msg("bot", text, replace_last=partial_shown)
+            elif partial_shown:
+                _drop_last("bot")
+            partial_shown = text is not None
+
+        def _on_partial(text: str) -> None:
+            if text.strip():
+                _put_bot(text)
+
+        cfg = load_api_config(cfg_path)
         try:
-            data = api_post_ask(cfg, prompt=prompt, new_chat=new_chat, timeout_s=timeout_s)
+            data = api_post_ask(cfg, prompt=prompt, new_chat=new_chat, timeout_s=timeout_s, on_partial=_on_partial)
         except Exception as e:
-            session["notice"] = f"Error llamando API: {e}"
-            session["notice_ok"] = False
-            return redirect(url_for("index"))
+            if partial_shown:
+                _put_bot(None)
+            return _redirect_with(f"Error llamando API: {e}", False, **prefs)
 
         if not data.get("ok"):
-            session["notice"] = json.dumps(data, ensure_ascii=False, indent=2)
-            session["notice_ok"] = False
-            return redirect(url_for("index"))
+            if partial_shown:
+                _put_bot(None)
+            return _redirect_with(json.dumps(data, ensure_ascii=False, indent=2), False, **prefs)
 
         resp = str(data.get("response") or "").strip()
-        msgs = _msgs()
-        msgs.append({"role": "bot", "text": resp or "(sin respuesta)"})
-        _set_msgs(msgs)
+        _put_bot(resp or "(sin respuesta)")
 
-        session["notice"] = f"OK (elapsed_s={data.get('elapsed_s')})"
-        session["notice_ok"] = True
-        return redirect(url_for("index"))
+        return _redirect_with(f"OK (elapsed_s={data.get('elapsed_s')})", True, **prefs)
 
     @app.post("/clear")
     def clear() -> str:
         sid = _sid()
-        with _STORE_LOCK:
-            _MESSAGE_STORE[sid] = []
-        session["notice"] = "Chat limpio."
-        session["notice_ok"] = True
-        return redirect(url_for("index"))
+        with _sid_lock(sid):
+            _MESSAGE_STORE[sid] = deque(maxlen=_MAX_MSGS)
+        return _redirect_with("Chat limpio.", True)
 
     return app
 
@@ -229,6 +432,9 @@ def main() -> int:
     host = os.environ.get("COMET_AUTO_CLIENT_HOST", "0.0.0.0")
     port = int(os.environ.get("COMET_AUTO_CLIENT_PORT", "5050"))
     app = create_app()
+    if hasattr(signal, "SIGHUP"):
+        # kill -HUP forces config.conf to be reparsed on the next request (no SIGHUP on Windows).
+        signal.signal(signal.SIGHUP, lambda *_: load_api_config.cache_clear())  # type: ignore[attr-defined]
     app.run(host=host, port=port, debug=False, threaded=True)
     return 0
 
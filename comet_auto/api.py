@@ -1,27 +1,84 @@
 from __future__ import annotations
 
 import argparse
-import json
+import hmac
 import os
 import threading
 import time
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Empty, Full, Queue
 from typing import Any
 
+import orjson
+
 from .comet import CometController
 from .config import AppConfig, load_config, save_config
 
 
-def _json_response(handler: BaseHTTPRequestHandler, status: int, payload: dict[str, Any]) -> None:
-    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-    handler.send_response(status)
-    handler.send_header("Content-Type", "application/json; charset=utf-8")
-    handler.send_header("Content-Length", str(len(data)))
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+_CORS_HEADERS = (
+    b"Access-Control-Allow-Origin: *\r\n"
+    b"Access-Control-Allow-Headers: Content-Type, Authorization, X-API-Key\r\n"
+    b"Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+)
+# Status line + fixed headers, prebuilt per status so a response is assembled with one concatenation.
+_JSON_PREFIX = {
+    status: (
+        f"HTTP/1.1 {status} {reason}\r\n".encode("ascii")
+        + b"Content-Type: application/json; charset=utf-8\r\n"
+        + _CORS_HEADERS
+    )
+    for status, reason in _REASONS.items()
+}
+
+
+def _json_response(handler: BaseHTTPRequestHandler, status: int, payload: dict[str, Any], close: bool = False) -> None:
+    data = orjson.dumps(payload)
+    prefix = _JSON_PREFIX.get(status)
+    if prefix is None:
+        prefix = f"HTTP/1.1 {status} {handler.responses.get(status, ('',))[0]}\r\n".encode("ascii")
+        prefix += b"Content-Type: application/json; charset=utf-8\r\n" + _CORS_HEADERS
+    head = b"%sServer: %s\r\nDate: %s\r\nContent-Length: %d\r\n" % (
+        prefix,
+        handler.version_string().encode("latin-1"),
+        handler.date_time_string().encode("latin-1"),
+        len(data),
+    )
+    if close:
+        # Drop the keep-alive connection after this response.
+        head += b"Connection: close\r\n"
+        handler.close_connection = True
+    handler.log_request(status)
+    # Headers and body leave in one sendall() on the raw socket (wfile is unbuffered, so ordering holds).
+    handler.request.sendall(head + b"\r\n" + data)
+
+
+def _sse_start(handler: BaseHTTPRequestHandler) -> None:
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/event-stream; charset=utf-8")
+    handler.send_header("Cache-Control", "no-cache")
+    # No Content-Length: the end of the stream is signalled by closing the connection.
+    handler.send_header("Connection", "close")
     handler.send_header("Access-Control-Allow-Origin", "*")
     handler.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization, X-API-Key")
     handler.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
     handler.end_headers()
-    handler.wfile.write(data)
+    handler.wfile.flush()
+
+
+def _sse_event(handler: BaseHTTPRequestHandler, payload: dict[str, Any], event: str | None = None) -> None:
+    data = orjson.dumps(payload)
+    frame = b"event: " + event.encode("utf-8") + b"\ndata: " if event else b"data: "
+    handler.wfile.write(frame + data + b"\n\n")
+    handler.wfile.flush()
 
 
 def _read_json(handler: BaseHTTPRequestHandler, max_bytes: int = 1024 * 1024) -> dict[str, Any]:
@@ -30,9 +87,11 @@ def _read_json(handler: BaseHTTPRequestHandler, max_bytes: int = 1024 * 1024) ->
         return {}
     if length > max_bytes:
         raise ValueError("Body too large")
-    raw = handler.rfile.read(length)
+    raw = bytearray(length)
+    if handler.rfile.readinto(raw) != length:
+        raise ValueError("Body truncated")
     try:
-        obj = json.loads(raw.decode("utf-8"))
+        obj = orjson.loads(raw)
     except Exception as e:
         raise ValueError(f"Invalid JSON: {e}") from e
     if not isinstance(obj, dict):
@@ -41,13 +100,31 @@ def _read_json(handler: BaseHTTPRequestHandler, max_bytes: int = 1024 * 1024) ->
 
 
 def _get_api_key(handler: BaseHTTPRequestHandler) -> str:
-    auth = (handler.headers.get("Authorization") or "").strip()
-    if auth.lower().startswith("bearer "):
-        return auth[7:].strip()
+    auth = handler.headers.get("Authorization")
+    if auth:
+        auth = auth.lstrip()
+        if auth[:7].lower() == "bearer ":
+            return auth[7:].strip()
     return (handler.headers.get("X-API-Key") or "").strip()
 
 
+def _config_from_env() -> AppConfig | None:
+    # Non-interactive setup (services, scripts): COMET_AUTO_COMET_EXE [+ COMET_AUTO_DEBUG_PORT].
+    env_exe = os.environ.get("COMET_AUTO_COMET_EXE", "").strip()
+    if not env_exe:
+        return None
+    env_port = os.environ.get("COMET_AUTO_DEBUG_PORT", "").strip()
+    try:
+        debug_port = int(env_port) if env_port else 9223
+    except ValueError:
+        debug_port = 0
+    if not 1 <= debug_port <= 65535:
+        raise SystemExit(f"COMET_AUTO_DEBUG_PORT inválido: {env_port!r} (debe ser un puerto entre 1 y 65535).")
+    return AppConfig(comet_exe=env_exe, debug_port=debug_port)
+
+
 def _prompt_config_interactive() -> AppConfig:
+
     detected = CometController.detect_comet_exe() or ""
     print("No existe config.json. Configuración inicial (API).")
     comet_exe = input(f"Ruta a comet.exe [{detected}]: ").strip() or detected
@@ -71,16 +148,72 @@ def _prompt_config_interactive() -> AppConfig:
     )
 
 
+_AskJob = tuple[str, bool, float, "Queue[tuple[str, Any]]"]
+_TIMEOUT_ERROR = "timeout: Comet no respondió a tiempo"
+# Slack on top of an ask's timeout_s for the work around the answer loop (connect, page ready, send).
+_ASK_MARGIN_S = 30.0
+
+
 class _State:
     def __init__(self, comet: CometController, api_key: str | None) -> None:
         self.comet = comet
-        self.lock = threading.Lock()
         self.api_key = api_key
+        self.api_key_bytes = api_key.encode("utf-8") if api_key else b""
+        # Handlers enqueue jobs and wait on their own reply queue; one worker drives Comet, so browser
+        # access is serialized without a lock.
+        self.ask_q: "Queue[_AskJob]" = Queue(maxsize=32)
+        # Sum of timeout_s + margin over queued and running jobs: how long a new job may wait in total.
+        self._backlog_s = 0.0
+        self._backlog_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._ask_worker, daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt: str, new_chat: bool, timeout_s: float) -> tuple["Queue[tuple[str, Any]]", float]:
+        # Returns the job's reply queue and the monotonic deadline for its reply; raises Full.
+        reply: "Queue[tuple[str, Any]]" = Queue()
+        budget = timeout_s + _ASK_MARGIN_S
+        with self._backlog_lock:
+            self.ask_q.put_nowait((prompt, new_chat, timeout_s, reply))
+            self._backlog_s += budget
+            return reply, time.monotonic() + self._backlog_s
+
+    def _ask_worker(self) -> None:
+        while True:
+            prompt, new_chat, timeout_s, reply = self.ask_q.get()
+            # The job's own deadline replaces the queue-position estimate from here on.
+            reply.put(("start", time.monotonic() + timeout_s + _ASK_MARGIN_S))
+            try:
+                for chunk in self.comet.ask_stream(prompt, new_chat=new_chat, timeout_s=timeout_s):
+                    reply.put(("chunk", chunk))
+                reply.put(("done", None))
+            except Exception as e:
+                reply.put(("error", e))
+            finally:
+                with self._backlog_lock:
+                    self._backlog_s -= timeout_s + _ASK_MARGIN_S
+
+
+def _next_reply(reply: "Queue[tuple[str, Any]]", deadline: float) -> tuple[str, Any, float]:
+    # Next (kind, value) for the handler, skipping "start" (which moves the deadline); ("timeout", None)
+    # once the deadline passes, so a wedged worker can't hang handler threads forever.
+    while True:
+        try:
+            kind, value = reply.get(timeout=max(0.0, deadline - time.monotonic()))
+        except Empty:
+            return "timeout", None, deadline
+        if kind != "start":
+            return kind, value, deadline
+        deadline = value
 
 
 def make_handler(state: _State) -> type[BaseHTTPRequestHandler]:
     class Handler(BaseHTTPRequestHandler):
         server_version = "CometAutoAPI/0.1"
+        # Keep-alive: a client reuses one connection (and one server thread) across requests.
+        protocol_version = "HTTP/1.1"
+        # Idle keep-alive connections are dropped after this many seconds instead of pinning a thread forever.
+        # It bounds socket reads/writes only; waiting on /ask's reply queue is not affected.
+        timeout = 30
 
         def log_message(self, fmt: str, *args: Any) -> None:
             # Quieter by default; enable via COMET_AUTO_API_LOG=1
@@ -93,7 +226,8 @@ def make_handler(state: _State) -> type[BaseHTTPRequestHandler]:
         def _auth_ok(self) -> bool:
             if not state.api_key:
                 return True
-            return _get_api_key(self) == state.api_key
+            # Constant-time compare so the key can't be guessed from response timing.
+            return hmac.compare_digest(_get_api_key(self).encode("utf-8"), state.api_key_bytes)
 
         def do_GET(self) -> None:
             if self.path.rstrip("/") == "/health":
@@ -115,12 +249,14 @@ def make_handler(state: _State) -> type[BaseHTTPRequestHandler]:
             _json_response(self, 404, {"ok": False, "error": "not_found"})
 
         def do_POST(self) -> None:
+            # Responses sent before the body is consumed must close the connection, or the unread
+            # body would be parsed as the next keep-alive request.
             if not self._auth_ok():
-                _json_response(self, 401, {"ok": False, "error": "unauthorized"})
+                _json_response(self, 401, {"ok": False, "error": "unauthorized"}, close=True)
                 return
 
             if self.path.rstrip("/") != "/ask":
-                _json_response(self, 404, {"ok": False, "error": "not_found"})
+                _json_response(self, 404, {"ok": False, "error": "not_found"}, close=True)
                 return
 
             try:
@@ -133,24 +269,45 @@ def make_handler(state: _State) -> type[BaseHTTPRequestHandler]:
                 if timeout_s <= 0:
                     timeout_s = 120.0
             except Exception as e:
-                _json_response(self, 400, {"ok": False, "error": str(e)})
+                _json_response(self, 400, {"ok": False, "error": str(e)}, close=True)
                 return
 
             started = time.time()
-            with state.lock:
-                try:
-                    response = state.comet.ask(prompt, new_chat=new_chat, timeout_s=timeout_s)
-                except Exception as e:
+            try:
+                reply, deadline = state.submit(prompt, new_chat, timeout_s)
+            except Full:
+                _json_response(self, 503, {"ok": False, "error": "busy: demasiadas peticiones en cola"})
+                return
+
+            if "text/event-stream" in (self.headers.get("Accept") or ""):
+                self._ask_stream(reply, deadline, started)
+                return
+
+            response = ""
+            while True:
+                kind, value, deadline = _next_reply(reply, deadline)
+                if kind == "chunk":
+                    response = value["response"]
+                    continue
+                if kind == "timeout":
+                    _json_response(
+                        self,
+                        504,
+                        {"ok": False, "error": _TIMEOUT_ERROR, "elapsed_s": round(time.time() - started, 3)},
+                    )
+                    return
+                if kind == "error":
                     _json_response(
                         self,
                         500,
                         {
                             "ok": False,
-                            "error": str(e),
+                            "error": str(value),
                             "elapsed_s": round(time.time() - started, 3),
                         },
                     )
                     return
+                break
 
             _json_response(
                 self,
@@ -163,6 +320,34 @@ def make_handler(state: _State) -> type[BaseHTTPRequestHandler]:
                 },
             )
 
+        def _ask_stream(self, reply: "Queue[tuple[str, Any]]", deadline: float, started: float) -> None:
+            _sse_start(self)
+            try:
+                while True:
+                    kind, value, deadline = _next_reply(reply, deadline)
+                    if kind == "done":
+                        return
+                    if kind in ("error", "timeout"):
+                        error = _TIMEOUT_ERROR if kind == "timeout" else str(value)
+                        _sse_event(
+                            self,
+                            {"ok": False, "error": error, "elapsed_s": round(time.time() - started, 3)},
+                            event="error",
+                        )
+                        return
+                    _sse_event(
+                        self,
+                        {
+                            "ok": True,
+                            "response": value["response"],
+                            "completed": bool(value["completed"]),
+                            "elapsed_s": round(time.time() - started, 3),
+                        },
+                    )
+            except OSError:
+                # Client went away; the worker finishes the job on its own.
+                return
+
     return Handler
 
 
@@ -176,7 +361,8 @@ def main(argv: list[str] | None = None) -> int:
 
     cfg = load_config()
     if cfg is None or args.setup:
-        cfg = _prompt_config_interactive()
+        # --setup explicitly asks for the prompts, so the env shortcut only applies to a missing config.
+        cfg = (None if args.setup else _config_from_env()) or _prompt_config_interactive()
         save_config(cfg)
 
     if not cfg.comet_exe:
@@ -193,7 +379,7 @@ def main(argv: list[str] | None = None) -> int:
     if api_key:
         print(f"[api] API key enabled (COMET_AUTO_API_KEY).")
     print(f"[api] Listening on http://{bind_host}:{bind_port}")
-    print(f"[api] Endpoints: GET /health, POST /ask")
+    print(f"[api] Endpoints: GET /health, POST /ask (Accept: text/event-stream para streaming)")
     print(f"[api] Example: curl -X POST http://{bind_host}:{bind_port}/ask -H \"Content-Type: application/json\" -d \"{{\\\"prompt\\\":\\\"hola\\\"}}\"")
 
     try:
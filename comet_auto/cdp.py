@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-import json
 import threading
 import time
 from dataclasses import dataclass
-from queue import Queue, Empty
+from queue import Empty, Full, Queue
 from typing import Any
 
+import orjson
 import websocket
 
 
@@ -21,6 +21,51 @@ class CDPError(Exception):
         return self.message
 
 
+# Prebuilt frame envelopes per method: (with params, without params). Filled on first use of a
+# method; the usual hot-path methods are built at import.
+_ENVELOPES: dict[str, tuple[bytes, bytes]] = {}
+
+
+def _envelope(method: str) -> tuple[bytes, bytes]:
+    env = _ENVELOPES.get(method)
+    if env is None:
+        head = b'{"id":%d,"method":' + orjson.dumps(method).replace(b"%", b"%%")
+        env = (head + b',"params":%b}', head + b"}")
+        _ENVELOPES[method] = env
+    return env
+
+
+for _m in (
+    "Runtime.evaluate",
+    "Runtime.callFunctionOn",
+    "Page.navigate",
+    "Page.enable",
+    "Runtime.enable",
+    "DOM.enable",
+    "Network.enable",
+):
+    _envelope(_m)
+del _m
+
+
+@dataclass(frozen=True)
+class BatchCall:
+    method: str
+    params: dict[str, Any] | None = None
+    # Index of an earlier call whose result feeds this one, and {param: "dotted.result.path"} to copy over.
+    input_from: int | None = None
+    bind: dict[str, str] | None = None
+
+
+def _dig(obj: Any, path: str) -> Any:
+    for key in path.split(".") if path else []:
+        if isinstance(obj, list):
+            obj = obj[int(key)]
+        else:
+            obj = obj[key]
+    return obj
+
+
 class CDPClient:
     def __init__(self) -> None:
         self._ws: websocket.WebSocket | None = None
@@ -28,15 +73,21 @@ class CDPClient:
         self._lock = threading.Lock()
         self._responses: dict[int, dict[str, Any]] = {}
         self._response_cv = threading.Condition()
-        self._events: "Queue[dict[str, Any]]" = Queue()
+        self._event_subs: dict[str, list["Queue[dict[str, Any]]"]] = {}
+        self._subs_lock = threading.Lock()
         self._reader: threading.Thread | None = None
         self._closed = True
+        # monotonic time of the last call that got a successful reply (0 = none since connect)
+        self.last_ok_at = 0.0
 
     def connect(self, ws_url: str, timeout_s: float = 10.0) -> None:
         self.close()
-        self._ws = websocket.create_connection(ws_url, timeout=timeout_s)
+        ws = websocket.create_connection(ws_url, timeout=timeout_s)
+        self._ws = ws
         self._closed = False
-        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self.last_ok_at = 0.0
+        # The reader is bound to its own socket so a reconnect never leaves two readers on one socket.
+        self._reader = threading.Thread(target=self._read_loop, args=(ws,), daemon=True)
         self._reader.start()
 
     def close(self) -> None:
@@ -48,7 +99,60 @@ class CDPClient:
                 pass
         self._ws = None
 
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and not self._closed
+
     def call(self, method: str, params: dict[str, Any] | None = None, timeout_s: float = 15.0) -> dict[str, Any]:
+        return self.call_many([(method, params)], timeout_s=timeout_s)[0]
+
+    def call_many(
+        self,
+        calls: list[tuple[str, dict[str, Any] | None]] | list[BatchCall],
+        timeout_s: float = 15.0,
+    ) -> list[dict[str, Any]]:
+        # Pipelined: every call of a layer is sent before waiting for any reply. BatchCall entries with
+        # input_from go in a later layer, with their bind params filled from the earlier result.
+        specs = [c if isinstance(c, BatchCall) else BatchCall(c[0], c[1]) for c in calls]
+        depth: list[int] = []
+        for i, spec in enumerate(specs):
+            if spec.input_from is None:
+                depth.append(0)
+            elif 0 <= spec.input_from < i:
+                depth.append(depth[spec.input_from] + 1)
+            else:
+                raise ValueError(f"input_from must reference an earlier call (got {spec.input_from} at {i})")
+
+        deadline = time.monotonic() + timeout_s
+        results: list[dict[str, Any]] = [{} for _ in specs]
+        for layer in range(max(depth, default=-1) + 1):
+            sent: list[tuple[int, int]] = []
+            for i, spec in enumerate(specs):
+                if depth[i] != layer:
+                    continue
+                params = dict(spec.params or {})
+                if spec.input_from is not None:
+                    for name, path in (spec.bind or {}).items():
+                        try:
+                            params[name] = _dig(results[spec.input_from], path)
+                        except (KeyError, IndexError, TypeError, ValueError):
+                            # e.g. an exception result without an objectId
+                            raise CDPError(
+                                f"bind path {path!r} missing in step {spec.input_from}", method=spec.method
+                            ) from None
+                sent.append((i, self._send(spec.method, params)))
+
+            msgs = self._wait_responses([call_id for _, call_id in sent], deadline, specs[sent[0][0]].method)
+            for i, call_id in sent:
+                msg = msgs[call_id]
+                if "error" in msg:
+                    err = msg["error"]
+                    raise CDPError(err.get("message", "Unknown CDP error"), method=specs[i].method)
+                results[i] = msg.get("result", {})
+        self.last_ok_at = time.monotonic()
+        return results
+
+    def _send(self, method: str, params: dict[str, Any] | None) -> int:
         if self._ws is None or self._closed:
             raise CDPError("Not connected", method=method)
 
@@ -56,51 +160,75 @@ class CDPClient:
             self._id += 1
             call_id = self._id
 
-        payload: dict[str, Any] = {"id": call_id, "method": method}
-        if params:
-            payload["params"] = params
+        with_params, without_params = _envelope(method)
+        frame = with_params % (call_id, orjson.dumps(params)) if params else without_params % call_id
 
-        self._ws.send(json.dumps(payload))
+        # websocket-client sends bytes as-is in a text frame (opcode defaults to OPCODE_TEXT).
+        self._ws.send(frame)
+        return call_id
 
-        deadline = time.time() + timeout_s
+    def _wait_responses(self, call_ids: list[int], deadline: float, method: str) -> dict[int, dict[str, Any]]:
         with self._response_cv:
-            while call_id not in self._responses:
-                remaining = deadline - time.time()
-                if remaining <= 0:
-                    raise CDPError("Timeout waiting for response", method=method)
+            while not all(call_id in self._responses for call_id in call_ids):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed:
+                    for call_id in call_ids:
+                        self._responses.pop(call_id, None)
+                    reason = "Connection closed" if self._closed else "Timeout waiting for response"
+                    raise CDPError(reason, method=method)
                 self._response_cv.wait(timeout=remaining)
 
-            msg = self._responses.pop(call_id)
-
-        if "error" in msg:
-            err = msg["error"]
-            raise CDPError(err.get("message", "Unknown CDP error"), method=method)
-        return msg.get("result", {})
-
-    def wait_for_event(self, event_method: str, timeout_s: float = 15.0) -> dict[str, Any]:
-        deadline = time.time() + timeout_s
-        while True:
-            remaining = deadline - time.time()
-            if remaining <= 0:
-                raise CDPError(f"Timeout waiting for event {event_method}")
+            return {call_id: self._responses.pop(call_id) for call_id in call_ids}
+
+    def subscribe(
+        self,
+        event_method: str,
+        maxsize: int = 16,
+        queue: "Queue[dict[str, Any]] | None" = None,
+    ) -> "Queue[dict[str, Any]]":
+        # Passing an existing queue lets several event methods feed one consumer.
+        q: "Queue[dict[str, Any]]" = queue if queue is not None else Queue(maxsize=maxsize)
+        with self._subs_lock:
+            self._event_subs.setdefault(event_method, []).append(q)
+        return q
+
+    def unsubscribe(self, event_method: str, q: "Queue[dict[str, Any]]") -> None:
+        with self._subs_lock:
+            subs = self._event_subs.get(event_method, [])
+            if q in subs:
+                subs.remove(q)
+            if not subs:
+                self._event_subs.pop(event_method, None)
+
+    def wait_for_event(
+        self,
+        event_method: str,
+        timeout_s: float = 15.0,
+        queue: "Queue[dict[str, Any]] | None" = None,
+    ) -> dict[str, Any]:
+        # Pass a queue from subscribe() to catch events fired before this call (e.g. right after Page.navigate).
+        q = queue if queue is not None else self.subscribe(event_method)
+        try:
+            return q.get(timeout=timeout_s)
+        except Empty:
+            raise CDPError(f"Timeout waiting for event {event_method}") from None
+        finally:
+            if queue is None:
+                self.unsubscribe(event_method, q)
+
+    def _read_loop(self, ws: websocket.WebSocket) -> None:
+        while self._ws is ws and not self._closed:
             try:
-                evt = self._events.get(timeout=min(0.5, remaining))
-            except Empty:
+                raw = ws.recv()
+            except websocket.WebSocketTimeoutException:
+                # The connect timeout also applies to recv; an idle tab is not a dead socket.
                 continue
-            if evt.get("method") == event_method:
-                return evt
-
-    def _read_loop(self) -> None:
-        assert self._ws is not None
-        while not self._closed:
-            try:
-                raw = self._ws.recv()
             except Exception:
                 break
             if not raw:
                 continue
             try:
-                msg = json.loads(raw)
+                msg = orjson.loads(raw)
             except Exception:
                 continue
             if "id" in msg:
@@ -108,5 +236,17 @@ class CDPClient:
                     self._responses[int(msg["id"])] = msg
                     self._response_cv.notify_all()
             elif "method" in msg:
-                self._events.put(msg)
+                with self._subs_lock:
+                    subs = list(self._event_subs.get(msg["method"], ()))
+                for q in subs:
+                    try:
+                        q.put_nowait(msg)
+                    except Full:
+                        pass
+
+        # Socket is gone: fail pending calls now instead of letting them run into their timeout.
+        with self._response_cv:
+            if self._ws is ws:
+                self._closed = True
+            self._response_cv.notify_all()
 
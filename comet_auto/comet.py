@@ -1,22 +1,48 @@
 from __future__ import annotations
 
+import functools
+import http.client
+import itertools
 import json
 import os
+import re
 import subprocess
 import sys
+import threading
 import time
 import urllib.parse
-import urllib.request
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Literal
+from queue import Empty, Queue
+from typing import Any, Callable, Iterator, Literal
 
-from .cdp import CDPClient, CDPError
+import orjson
+
+from .cdp import BatchCall, CDPClient, CDPError
 from .config import AppConfig
 
 
 Status = Literal["idle", "working", "completed"]
 
+# Network events used to notice when Perplexity's streamed answer finishes.
+_STREAM_EVENTS = ("Network.responseReceived", "Network.loadingFinished", "Network.loadingFailed")
+_STREAM_MIMES = ("text/event-stream", "application/x-ndjson")
+# Runtime binding the page's MutationObserver calls (throttled) so the answer loop wakes on DOM changes.
+_NOTIFY_BINDING = "__cometNotify"
+_PAGE_EVENTS = (*_STREAM_EVENTS, "Runtime.bindingCalled")
+
+_ENABLE_DOMAINS = ("Page.enable", "Runtime.enable", "DOM.enable", "Network.enable")
+
+# Answer-loop completion flags. Any done signal counts once there is a response and the page is not busy;
+# _DONE_MASKS enumerates exactly those combinations.
+_F_COMPLETED = 1  # scraper reported "completed"
+_F_STREAM_DONE = 2  # every answer stream closed
+_F_STABLE = 4  # stable and > 120 chars
+_F_IDLE = 8  # idle > 8 s and > 200 chars
+_F_RESPONSE = 16  # a new, non-empty response was seen
+_F_BUSY = 32  # stop button or loading indicator
+_DONE_MASKS = frozenset(_F_RESPONSE | signals for signals in range(1, 16))
+
 
 @dataclass
 class AgentStatus:
@@ -38,22 +64,101 @@ class AgentStatus:
     is_stable: bool
 
 
-def _http_json(url: str, method: str = "GET", timeout_s: float = 5.0) -> Any:
-    req = urllib.request.Request(url=url, method=method)
-    with urllib.request.urlopen(req, timeout=timeout_s) as resp:
-        data = resp.read().decode("utf-8", errors="replace")
-    return json.loads(data)
+class _DevToolsHTTP:
+    # Keep-alive connection to the DevTools HTTP endpoint (/json/*), shared by all callers of a port.
+    def __init__(self, port: int) -> None:
+        self.port = port
+        self._conn: http.client.HTTPConnection | None = None
+        self._lock = threading.Lock()
+
+    def request_json(self, path: str, method: str = "GET", timeout_s: float = 5.0) -> Any:
+        with self._lock:
+            while True:
+                reused = self._conn is not None
+                if self._conn is None:
+                    self._conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=timeout_s)
+                conn = self._conn
+                conn.timeout = timeout_s
+                try:
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout_s)
+                    conn.request(method, path)
+                    resp = conn.getresponse()
+                    data = resp.read()
+                except (http.client.HTTPException, OSError) as e:
+                    self._close()
+                    if isinstance(e, TimeoutError):
+                        raise
+                    if reused:
+                        # The kept-alive socket went stale; retry once on a fresh connection.
+                        continue
+                    raise
+                if resp.will_close:
+                    self._close()
+                if resp.status >= 400:
+                    raise RuntimeError(f"HTTP {resp.status} en {path}")
+                return orjson.loads(data)
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+
+
+_HTTP_POOL: dict[int, _DevToolsHTTP] = {}
+_HTTP_POOL_LOCK = threading.Lock()
+
+
+def _http_json(port: int, path: str, method: str = "GET", timeout_s: float = 5.0) -> Any:
+    with _HTTP_POOL_LOCK:
+        client = _HTTP_POOL.get(port)
+        if client is None:
+            client = _HTTP_POOL[port] = _DevToolsHTTP(port)
+    return client.request_json(path, method=method, timeout_s=timeout_s)
 
 
 def _port_ready(port: int) -> bool:
     try:
-        _http_json(f"http://127.0.0.1:{port}/json/version", timeout_s=1.5)
+        _http_json(port, "/json/version", timeout_s=1.5)
         return True
     except Exception:
         return False
 
 
-def _default_comet_paths() -> list[str]:
+def _backoff(base: float = 0.025, cap: float = 0.4) -> Iterator[float]:
+    # 25 ms, 50 ms, 100 ms... capped: fast when the thing is almost ready, few probes when it isn't.
+    delay = base
+    while True:
+        yield delay
+        delay = min(delay * 2, cap)
+
+
+# Probe schedule while a freshly launched Comet opens its debug port: a warm start shows up on the first
+# few probes, a cold one is polled at most every 3 s.
+_LAUNCH_DELAYS_S = (0.05, 0.1, 0.2, 0.4, 0.8, 1.5, 3.0)
+
+
+def _wait_until(
+    fn: Callable[[], Any],
+    deadline: float,
+    base: float = 0.025,
+    cap: float = 0.4,
+    schedule: tuple[float, ...] | None = None,
+) -> Any:
+    # schedule, when given, replaces the doubling backoff; its last delay repeats once it runs out.
+    delays = itertools.chain(schedule, itertools.repeat(schedule[-1])) if schedule else _backoff(base, cap)
+    while True:
+        result = fn()
+        if result:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return result
+        time.sleep(min(next(delays), remaining))
+
+
+@functools.lru_cache(maxsize=1)
+def _default_comet_paths() -> tuple[str, ...]:
     local = os.environ.get("LOCALAPPDATA", "")
     roaming = os.environ.get("APPDATA", "")
     candidates = [
@@ -62,25 +167,556 @@ def _default_comet_paths() -> list[str]:
         r"C:\Program Files\Perplexity\Comet\Application\comet.exe",
         r"C:\Program Files (x86)\Perplexity\Comet\Application\comet.exe",
     ]
-    return [p for p in candidates if p and Path(p).exists()]
+    return tuple(p for p in candidates if p and Path(p).exists())
 
 
 def _is_internal_url(url: str) -> bool:
-    u = (url or "").lower().strip()
+    # Only the head can match; "chrome-extension://" is the longest prefix (19 chars).
+    u = (url or "").lstrip()[:19].lower()
     return u.startswith(("chrome://", "edge://", "devtools://", "about:", "chrome-extension://"))
 
 
+def _normalize_prompt(prompt: str) -> str:
+    # Similar to example_mcp_comet: collapse bullets/newlines for browser input reliability
+    p = prompt.strip()
+    p = "\n".join(line.lstrip("-*• ").rstrip() for line in p.splitlines())
+    p = " ".join(p.split())
+    return p.strip()
+
+
+# Website actions and site names that mean the prompt needs the browser agent. Plain substrings, matched
+# case-insensitively in one pass over the prompt.
+_AGENTIC_RE = re.compile(
+    "|".join(
+        re.escape(w)
+        for w in (
+            "go to", "visit", "navigate", "open", "browse", "check", "look at", "click", "fill", "submit", "login", "sign in",
+            ".com", ".org", ".io", ".net", ".ai", "website", "webpage", "page", "site",
+        )
+    ),
+    re.IGNORECASE,
+)
+# First whitespace-delimited token starting with a URL scheme.
+_URL_TOKEN_RE = re.compile(r"(?<!\S)https?://\S*")
+
+
+def _maybe_make_agentic(prompt: str) -> str:
+    has_url = "http://" in prompt or "https://" in prompt
+    needs_agentic = has_url or _AGENTIC_RE.search(prompt) is not None
+    if not needs_agentic:
+        return prompt
+
+    lower = prompt.lower()
+    already_agentic = lower.startswith(("use your browser", "using your browser", "open a browser", "navigate to", "browse to"))
+    if already_agentic:
+        return prompt
+
+    if has_url:
+        # Extract first URL and reframe; the match position gives the rest without another scan.
+        m = _URL_TOKEN_RE.search(prompt)
+        if m is not None:
+            url = m.group()
+            rest = (prompt[: m.start()] + prompt[m.end() :]).strip()
+            return f"Use your browser to navigate to {url} and {rest or 'tell me what you find there'}"
+    return f"Use your browser to {prompt}"
+
+
+# Installs window.__cometFindInput(): the visible assistant input (perplexity.ai or the Comet sidebar). The hit is
+# cached on window.__cometInput for the page's lifetime and only looked up again once it has left the DOM or
+# been hidden. Spliced into the snippets below in place of /*FIND_INPUT*/.
+_FIND_INPUT_JS = """
+if (!window.__cometFindInput) {
+  const isAssistantField = (el) => {
+    if (!el) return false;
+    const ph = (el.getAttribute('placeholder') || '').toLowerCase();
+    const aria = (el.getAttribute('aria-label') || '').toLowerCase();
+    const role = (el.getAttribute('role') || '').toLowerCase();
+    const cls = (el.className || '').toLowerCase();
+    const hint = (ph + ' ' + aria + ' ' + role + ' ' + cls);
+    if (el.getAttribute('contenteditable') === 'true') {
+      const url = (window.location && window.location.href) ? window.location.href.toLowerCase() : '';
+      if (url.includes('perplexity.ai')) return true;
+      try {
+        const r = el.getBoundingClientRect();
+        if (r.left > window.innerWidth * 0.18) return true;
+      } catch {}
+      return false;
+    }
+    // Avoid generic page inputs by requiring assistant-like hints
+    return /(ask|pregunt|message|follow|seguimiento|solicitar|qué quieres saber|ask anything|type a message|add details)/i.test(hint);
+  };
+  const isVisible = (el) => {
+    const r = el.getBoundingClientRect();
+    const style = window.getComputedStyle(el);
+    return r.width > 0 && r.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+  };
+  window.__cometFindInput = () => {
+    const cached = window.__cometInput;
+    if (cached && cached.isConnected && isVisible(cached)) return cached;
+    window.__cometInput = null;
+    for (const el of document.querySelectorAll('[contenteditable="true"], textarea, input[type="text"]')) {
+      if (isAssistantField(el) && isVisible(el)) return (window.__cometInput = el);
+    }
+    return null;
+  };
+}
+"""
+
+# Looks up the assistant input and reports where the page is; used while waiting for the UI to be ready.
+_INPUT_PROBE_JS = _FIND_INPUT_JS + """
+(() => {
+  const el = window.__cometFindInput();
+  return {
+    url: window.location.href,
+    ready: document.readyState,
+    found: el !== null,
+    inputSel: !el ? '' : (el.getAttribute('contenteditable') === 'true') ? '[contenteditable="true"]' : (el.tagName || '').toLowerCase(),
+    hint: el ? (el.getAttribute('placeholder') || el.getAttribute('aria-label') || '').toString() : ''
+  };
+})()
+"""
+
+
+# Status scraper run on every poll through Runtime.callFunctionOn; kept at module level so the source is
+# built once. The arguments are the DOM signature of the caller's last full scrape and the id of the
+# response text it already holds.
+_AGENT_STATUS_FN = """
+function (lastSig, lastRespId) {
+  // Constant tables and patterns are built once per document and reused by every poll. Bump v when
+  // they change so a tab that outlives a server restart doesn't keep a stale table.
+  const K = (window.__cometStatusK && window.__cometStatusK.v === 5) ? window.__cometStatusK : (window.__cometStatusK = {
+    v: 5,
+    END_MARKERS: [
+      'Ask anything', 'Ask a follow-up', 'Ask follow-up', 'Add details', 'Type a message',
+      'Preguntar algo', 'Escribe un mensaje', 'Añadir detalles', 'Agregar detalles', 'Pregunta de seguimiento'
+    ],
+    BLOCK_SELECTOR: [
+      '[class*="prose"]',
+      '[class*="markdown"]',
+      '[data-testid*="answer"]',
+      '[data-testid*="message"]',
+      'article',
+      '[role="article"]'
+    ].join(', '),
+    STEP_CANDIDATES: ['Preparing', 'Navigating', 'Clicking', 'Scrolling', 'Reading', 'Extracting', 'Answering'],
+    // One alternation per question so each is answered by a single scan of the text.
+    LOADING_RE: /\\b(thinking|searching|researching|analyzing|loading|pensando|buscando|investigando|analizando|cargando)\\b/i,
+    FOLLOWUP_RE: /Ask a follow-up|Ask follow-up|Ask anything|Type a message|Add details|Preguntar algo|Pregunta algo|Escribe un mensaje|Añadir detalles|Agregar detalles|Pregunta de seguimiento/,
+    STEPS_RE: /Preparing|Navigating|Clicking|Scrolling|Reading|Extracting|Answering/g,
+    OMITTED_RE: /respuesta omitida|(response|answer|output) omitted/i,
+    RETRYABLE_RE: /something went wrong|network error/i,
+    RETRY_BTN_RE: /try again|retry|regenerate|reintentar|intentar de nuevo|regenerar/,
+    STEPS_DONE_RE: /\\d+\\s+(steps?|pasos?)\\s+(completed|completad[oa]s?)/i,
+    SOURCES_RE: /Reviewed\\s+\\d+\\s+sources?/i,
+    UI_HEADER_RE: /^(perplexity|asistente|enlaces|imágenes|images|links)$/i,
+    // UI artifacts stripped from the response in a single pass.
+    CLEAN_RE: /View All|Show more|Ask a follow-up|Ask anything\\.*|Type a message\\.*|Add details\\.*/gi,
+    BLANK_LINES_RE: /\\n{3,}/g
+  });
+
+  // Cheap pre-check: a MutationObserver bumps a counter on every DOM change. If nothing changed since
+  // the caller's last full scrape, skip the innerText serialization and scans entirely.
+  if (!window.__cometMut) {
+    const mut = window.__cometMut = { id: Math.random().toString(36).slice(2), n: 0, timer: 0 };
+    new MutationObserver(() => {
+      mut.n++;
+      // Notify Python through the Runtime binding at most every 200 ms.
+      if (!mut.timer && typeof window.__cometNotify === 'function') {
+        mut.timer = setTimeout(() => {
+          mut.timer = 0;
+          try { window.__cometNotify(String(mut.n)); } catch {}
+        }, 200);
+      }
+    }).observe(document.documentElement, {
+      subtree: true, childList: true, characterData: true, attributes: true
+    });
+  }
+  const sig = window.__cometMut.id + ':' + window.__cometMut.n;
+  if (sig === lastSig) return { unchanged: true, sig };
+  const pageUrl = window.location.href;
+  const pageTitle = document.title || '';
+
+  // Find the currently visible input (works for perplexity.ai and Comet sidebar assistant)
+  /*FIND_INPUT*/
+  const inputEl = window.__cometFindInput();
+  const inputSel = !inputEl ? '' :
+    (inputEl.getAttribute('contenteditable') === 'true') ? '[contenteditable="true"]' : (inputEl.tagName || '').toLowerCase();
+
+  // Try to locate the assistant "panel" root around the input (avoids reading the underlying page main content)
+  let root = null;
+  let extractor = 'body';
+  if (inputEl && inputEl.parentElement) {
+    let node = inputEl;
+    let lastPanel = null;
+    for (let i = 0; i < 10 && node; i++) {
+      node = node.parentElement;
+      if (!node) break;
+      const rect = node.getBoundingClientRect();
+      const isPanelLike =
+        rect.height > window.innerHeight * 0.45 &&
+        rect.width > 260 &&
+        rect.width < window.innerWidth * 0.98 &&
+        rect.left > window.innerWidth * 0.18;
+      if (isPanelLike) lastPanel = node;
+    }
+    if (lastPanel) {
+      root = lastPanel;
+      extractor = 'panel';
+    }
+  }
+  if (!root) {
+    root = document.querySelector('main') || document.querySelector('[role="main"]') || document.body;
+    extractor = root === document.body ? 'body' : 'main';
+  }
+
+  // innerText is serialized once, for the scope only; root falls back to body so nothing is lost.
+  const scopeText = (root && root.innerText) ? root.innerText : '';
+  const tailText = scopeText.slice(-3000);
+  // Placeholder text of the input ("Ask a follow-up"...) may render outside the scope.
+  let followupText = scopeText;
+  if (inputEl && !root.contains(inputEl)) {
+    followupText = (inputEl.getAttribute('placeholder') || '') + ' ' + (inputEl.getAttribute('aria-label') || '') + ' ' +
+      ((inputEl.parentElement && inputEl.parentElement.innerText) || '');
+  }
+
+  const hasLoading =
+    document.querySelector('[class*="animate-spin"], [class*="animate-pulse"], [class*="loading"], [class*="thinking"]') !== null ||
+    K.LOADING_RE.test(scopeText);
+
+  const hasFollowup = K.FOLLOWUP_RE.test(followupText);
+
+  // Detect "omitted" / error states
+  let errorType = '';
+  let errorText = '';
+  // IMPORTANT: only look at the tail of the page so old errors don't trigger on new prompts.
+  if (K.OMITTED_RE.test(tailText)) {
+    errorType = 'omitted';
+    errorText = 'Respuesta omitida';
+  } else if (
+    K.RETRYABLE_RE.test(tailText) ||
+    (/error/i.test(tailText) && /try again|retry/i.test(tailText))
+  ) {
+    errorType = 'retryable_error';
+    errorText = 'Error (reintentar)';
+  }
+
+  // One pass over the visible, enabled buttons computes both the stop and retry flags.
+  let hasStop = false;
+  let hasRetryButton = false;
+  for (const btn of document.querySelectorAll('button')) {
+    if (btn.offsetParent === null || btn.disabled) continue;
+    const aria = (btn.getAttribute('aria-label') || '').toLowerCase();
+    const txt = (btn.innerText || '').toLowerCase();
+    if (!hasStop) {
+      const title = (btn.getAttribute('title') || '').toLowerCase();
+      const testid = (btn.getAttribute('data-testid') || '').toLowerCase();
+      hasStop =
+        aria.includes('stop') || aria.includes('cancel') ||
+        title.includes('stop') || title.includes('cancel') ||
+        testid.includes('stop') ||
+        aria.includes('detener') || aria.includes('cancelar') ||
+        title.includes('detener') || title.includes('cancelar') ||
+        txt === 'stop' || txt === 'detener' || txt === 'cancelar' ||
+        btn.querySelector('svg rect') !== null;
+    }
+    if (errorType && !hasRetryButton && K.RETRY_BTN_RE.test(txt + ' ' + aria)) {
+      hasRetryButton = true;
+      // Remembered so click_retry() can click it without scanning the buttons again.
+      window.__cometRetryBtn = btn;
+    }
+    if (hasStop && (hasRetryButton || !errorType)) break;
+  }
+
+  let status = 'idle';
+  if (hasStop || hasLoading) status = 'working';
+
+  // Extract response
+  let response = '';
+
+  // Strategy 1: Content after "X steps completed" marker (agentic final answer)
+  const stepsMatch = scopeText.match(K.STEPS_DONE_RE);
+  if (stepsMatch) {
+    const markerIndex = scopeText.indexOf(stepsMatch[0]);
+    if (markerIndex !== -1) {
+      let after = scopeText.substring(markerIndex + stepsMatch[0].length).trim();
+      after = after.replace(/^[>›→\\s]+/, '').trim();
+      let endIndex = after.length;
+      for (const m of K.END_MARKERS) {
+        const idx = after.indexOf(m);
+        if (idx !== -1 && idx < endIndex) endIndex = idx;
+      }
+      response = after.substring(0, endIndex).trim();
+    }
+  }
+
+  // Strategy 2: Content after "Reviewed X sources" marker
+  if (!response || response.length < 80) {
+    const sourcesMatch = scopeText.match(K.SOURCES_RE);
+    if (sourcesMatch) {
+      const markerIndex = scopeText.indexOf(sourcesMatch[0]);
+      if (markerIndex !== -1) {
+        let after = scopeText.substring(markerIndex + sourcesMatch[0].length).trim();
+        let endIndex = after.length;
+        for (const m of K.END_MARKERS) {
+          const idx = after.indexOf(m);
+          if (idx !== -1 && idx < endIndex) endIndex = idx;
+        }
+        response = after.substring(0, endIndex).trim();
+      }
+    }
+  }
+
+  // Strategy 3: Capture recent content blocks above the input (works well for both perplexity.ai and sidebar UI)
+  if (!response || response.length < 120) {
+    const inputTop = inputEl ? inputEl.getBoundingClientRect().top : Infinity;
+    // One combined query returns each block once, in document order; walking it from the end stops
+    // after the last 10 usable blocks instead of measuring and copying every block on the page.
+    let nl = [];
+    try { nl = root.querySelectorAll(K.BLOCK_SELECTOR); } catch {}
+    const picked = new Array(10);
+    let pi = picked.length;
+    for (let i = nl.length - 1; i >= 0 && pi > 0; i--) {
+      const el = nl[i];
+      if (inputEl && el.contains && el.contains(inputEl)) continue;
+      if (el.closest && el.closest('nav, header, footer')) continue;
+      const r = el.getBoundingClientRect();
+      if (r.width <= 0 || r.height <= 0) continue;
+      if (r.bottom > inputTop - 6) continue; // below or overlapping input area
+      const text = (el.innerText || '').trim();
+      if (!text || text.length < 12) continue;
+      // Skip UI-only small headers
+      if (K.UI_HEADER_RE.test(text)) continue;
+      picked[--pi] = text;
+    }
+    if (pi < picked.length) response = picked.slice(pi).join('\\n\\n');
+  }
+
+  // Strategy 4: Last resort, use scope text (trimmed)
+  if ((!response || response.length < 120) && scopeText) {
+    response = scopeText.trim();
+  }
+
+  // Clean response a bit (UI artifacts)
+  if (response) {
+    response = response.replace(K.CLEAN_RE, '').replace(K.BLANK_LINES_RE, '\\n\\n').trim();
+  }
+  // Only the first 8000 chars are ever used; don't ship the rest over the socket.
+  if (response.length > 8000) response = response.slice(0, 8000);
+
+  // Basic "steps" scraping (best-effort)
+  const hits = new Set(scopeText.match(K.STEPS_RE) || []);
+  const steps = K.STEP_CANDIDATES.filter(s => hits.has(s));
+
+  // Completion heuristic (signal-only; stability handled in Python loop)
+  if (!errorType && !hasStop && !hasLoading && response && response.length > 120 && hasFollowup) status = 'completed';
+
+  // The text often survives DOM changes (spinners, step list, streaming elsewhere); each distinct text
+  // gets an id so it is only sent to a caller that doesn't already hold it.
+  const rs = window.__cometResp || (window.__cometResp = { n: 0, text: '' });
+  if (rs.text !== response) {
+    rs.text = response;
+    rs.n++;
+  }
+  const respId = window.__cometMut.id + ':' + rs.n;
+  const sameResponse = respId === lastRespId;
+  return {
+    status,
+    steps,
+    currentStep: steps.length ? steps[steps.length-1] : '',
+    response: sameResponse ? '' : response,
+    sameResponse,
+    respId,
+    hasStopButton: hasStop,
+    hasLoading,
+    hasFollowup,
+    errorType,
+    errorText,
+    hasRetryButton,
+    pageUrl,
+    pageTitle,
+    extractor,
+    debugTail: tailText.slice(-400),
+    inputSel,
+    sig
+  };
+}
+""".replace("/*FIND_INPUT*/", _FIND_INPUT_JS)
+
+# Installed once per document (Page.addScriptToEvaluateOnNewDocument + the current page) so each poll is a
+# short call instead of the whole scraper source.
+_STATUS_INSTALL_JS = "window.__cometStatus = " + _AGENT_STATUS_FN.strip() + ";"
+_CALL_STATUS_FN = (
+    "function (lastSig, lastRespId) {"
+    " return window.__cometStatus ? window.__cometStatus(lastSig, lastRespId) : { missing: true }; }"
+)
+
+
+# Typing + submission (with its fallbacks) + check. The function object is created once per document and
+# kept as a remote handle; each send is a callFunctionOn on it with the prompt as an argument, so the
+# source isn't resent and the prompt is never escaped into JS.
+_SEND_PROMPT_FN = """
+async function (prompt) {
+  const sleep = (ms) => new Promise(r => setTimeout(r, ms));
+  /*FIND_INPUT*/
+  const readContent = (el) => (el.getAttribute && el.getAttribute('contenteditable') === 'true')
+    ? (el.innerText || '')
+    : (el.value || '');
+
+  const target = window.__cometFindInput();
+  if (!target) return { ok: false, reason: 'no assistant input' };
+
+  target.focus();
+
+  // Prefer execCommand for contenteditable (works with React/Vue), fallback to direct assignment + input event
+  if (target.getAttribute && target.getAttribute('contenteditable') === 'true') {
+    try {
+      document.execCommand('selectAll', false, null);
+      document.execCommand('insertText', false, prompt);
+    } catch {
+      target.innerText = '';
+      target.innerText = prompt;
+      target.dispatchEvent(new InputEvent('input', { bubbles: true, inputType: 'insertText', data: prompt }));
+    }
+  } else {
+    target.value = prompt;
+    target.dispatchEvent(new Event('input', { bubbles: true }));
+  }
+
+  // Verify content exists
+  if (readContent(target).trim().length === 0) return { ok: false, reason: 'empty after typing' };
+
+  // Let the framework pick up the input: one frame plus a short settle. rAF doesn't fire in background
+  // tabs, so the old fixed 300 ms is kept as the cap.
+  await new Promise(r => { requestAnimationFrame(() => setTimeout(r, 50)); setTimeout(r, 300); });
+  const el = document.contains(target) ? target : window.__cometFindInput();
+  if (el) {
+    el.focus();
+    for (const type of ['keydown', 'keypress', 'keyup']) {
+      el.dispatchEvent(new KeyboardEvent(type, { key: 'Enter', code: 'Enter', keyCode: 13, which: 13, bubbles: true, cancelable: true }));
+    }
+  }
+
+  // Cheap signals every 50 ms, the innerText scan only once the window is over.
+  const loadingSel = '[class*="animate-spin"], [class*="animate-pulse"], [class*="loading"], [class*="thinking"]';
+  const waitSubmitted = async (ms) => {
+    const end = Date.now() + ms;
+    for (;;) {
+      const after = target.isConnected ? target : window.__cometFindInput();
+      if ((after && readContent(after).trim().length < 2) || document.querySelector(loadingSel) !== null) return true;
+      if (Date.now() >= end) break;
+      await sleep(50);
+    }
+    const body = document.body ? document.body.innerText : '';
+    return body.includes('Thinking') || body.includes('Pensando');
+  };
+  if (await waitSubmitted(800)) return { ok: true, submitted: true, via: 'enter' };
+
+  const usable = (btn) => !!btn && !btn.disabled && btn.offsetParent !== null;
+  const looksLikeSubmit = (btn) => {
+    const aria = (btn.getAttribute('aria-label') || '').toLowerCase();
+    const txt = (btn.innerText || '').toLowerCase();
+    if (aria.includes('search') || aria.includes('research') || aria.includes('labs') || aria.includes('learn')) return false;
+    if (aria.includes('attach') || aria.includes('voice') || aria.includes('menu') || aria.includes('more')) return false;
+    if (txt.includes('attach') || txt.includes('voice')) return false;
+    return true;
+  };
+  // Structural path (nth-of-type from the nearest id, or body) so the button can be found directly next time.
+  const selectorFor = (el) => {
+    const parts = [];
+    let node = el;
+    for (; node && node !== document.body; node = node.parentElement) {
+      if (node.id) { parts.unshift('#' + CSS.escape(node.id)); break; }
+      let i = 1;
+      for (let sib = node.previousElementSibling; sib; sib = sib.previousElementSibling) {
+        if (sib.tagName === node.tagName) i++;
+      }
+      parts.unshift(node.tagName.toLowerCase() + ':nth-of-type(' + i + ')');
+    }
+    if (!node || node === document.body) parts.unshift('body');
+    return parts.join(' > ');
+  };
+  const click = (btn) => {
+    btn.click();
+    try { window.__cometSubmitSel = selectorFor(btn); } catch {}
+    return true;
+  };
+  const clickSubmit = () => {
+    // The button that worked last time on this page; re-checked since the DOM may have shifted.
+    if (window.__cometSubmitSel) {
+      let btn = null;
+      try { btn = document.querySelector(window.__cometSubmitSel); } catch {}
+      if (usable(btn) && looksLikeSubmit(btn)) return click(btn);
+      window.__cometSubmitSel = null;
+    }
+    const selectors = [
+      'button[aria-label*="Submit"]',
+      'button[aria-label*="Send"]',
+      'button[aria-label*="Ask"]',
+      'button[type="submit"]',
+    ];
+    for (const sel of selectors) {
+      const btn = document.querySelector(sel);
+      if (usable(btn)) return click(btn);
+    }
+    // Position-based fallback: rightmost visible button near input
+    const inputEl = window.__cometFindInput();
+    if (inputEl) {
+      let parent = inputEl.parentElement;
+      const seen = new Set();
+      const candidates = [];
+      for (let i = 0; i < 6 && parent; i++) {
+        for (const btn of parent.querySelectorAll('button')) {
+          if (seen.has(btn)) continue;
+          seen.add(btn);
+          if (!usable(btn)) continue;
+          const rect = btn.getBoundingClientRect();
+          if (rect.width <= 0 || rect.height <= 0) continue;
+          if (!looksLikeSubmit(btn)) continue;
+          candidates.push({ btn, x: rect.right, y: rect.top });
+        }
+        parent = parent.parentElement;
+      }
+      if (candidates.length) {
+        candidates.sort((a, b) => b.x - a.x);
+        return click(candidates[0].btn);
+      }
+    }
+    return false;
+  };
+  if (clickSubmit() && await waitSubmitted(700)) return { ok: true, submitted: true, via: 'click' };
+
+  // Last resort: try dispatching a submit event
+  const form = document.querySelector('form');
+  if (form) form.dispatchEvent(new Event('submit', { bubbles: true, cancelable: true }));
+  return { ok: true, submitted: false, via: form ? 'form' : '' };
+}
+""".replace("/*FIND_INPUT*/", _FIND_INPUT_JS)
+_SEND_PROMPT_EXPR = "(" + _SEND_PROMPT_FN.strip() + ")"
+
+
 class CometController:
     def __init__(self, cfg: AppConfig) -> None:
         self.cfg = cfg
         self.cdp = CDPClient()
         self._active_target_id: str | None = None
-        self._last_response_text = ""
-        self._stable_count = 0
-        self._stability_threshold = 3
+        self._last_response_sig: tuple[int, int] = (0, 0)
+        # monotonic time the response last changed; stability is measured in time, not polls, since the
+        # answer loop's poll interval varies
+        self._response_changed_at = 0.0
+        self._stability_s = 3.0
+        # Remote handles (expression -> objectId) used as Runtime.callFunctionOn receivers
+        self._handles: dict[str, str] = {}
+        # Top-frame URL kept current from Page.frameNavigated (None = unknown)
+        self._current_url: str | None = None
+        self._nav_q: "Queue[dict[str, Any]] | None" = None
+        # Last full status payload and the DOM signature it was scraped at
+        self._status_sig = ""
+        self._status_payload: dict[str, Any] = {}
+        self._status_resp_id = ""
         self._debug_enabled = os.environ.get("COMET_AUTO_DEBUG", "").strip() not in ("", "0", "false", "False")
 
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def detect_comet_exe() -> str | None:
         paths = _default_comet_paths()
         return paths[0] if paths else None
@@ -127,19 +763,34 @@ class CometController:
             creationflags=creationflags,
         )
 
-        deadline = time.time() + 20
-        while time.time() < deadline:
-            if _port_ready(self.cfg.debug_port):
-                return
-            time.sleep(0.5)
+        if _wait_until(lambda: _port_ready(self.cfg.debug_port), deadline=time.monotonic() + 20, schedule=_LAUNCH_DELAYS_S):
+            return
         raise RuntimeError("Timeout esperando a que Comet exponga el puerto de debug.")
 
     def list_targets(self) -> list[dict[str, Any]]:
-        return _http_json(f"http://127.0.0.1:{self.cfg.debug_port}/json/list")
+        # Once a socket is up, ask for page targets over it; /json/list is only the bootstrap path.
+        if self.cdp.connected:
+            try:
+                infos = self.cdp.call("Target.getTargets", {"filter": [{"type": "page"}]}, timeout_s=5).get("targetInfos")
+            except CDPError:
+                infos = None
+            if isinstance(infos, list):
+                return [
+                    {
+                        "id": t.get("targetId"),
+                        "type": t.get("type"),
+                        "title": t.get("title"),
+                        "url": t.get("url"),
+                        "webSocketDebuggerUrl": f"ws://127.0.0.1:{self.cfg.debug_port}/devtools/page/{t.get('targetId')}",
+                    }
+                    for t in infos
+                    if t.get("type") == "page"
+                ]
+        return _http_json(self.cfg.debug_port, "/json/list")
 
     def new_tab(self, url: str) -> dict[str, Any]:
         encoded = urllib.parse.quote(url, safe="")
-        return _http_json(f"http://127.0.0.1:{self.cfg.debug_port}/json/new?{encoded}", method="PUT")
+        return _http_json(self.cfg.debug_port, f"/json/new?{encoded}", method="PUT")
 
     def connect_best_tab(self) -> None:
         self.start_comet()
@@ -166,42 +817,8 @@ class CometController:
 
             def has_assistant_input() -> bool:
                 try:
-                    return bool(
-                        self._eval(
-                            """
-                            (() => {
-                              const isAssistantField = (el) => {
-                                if (!el) return false;
-                                const ph = (el.getAttribute('placeholder') || '').toLowerCase();
-                                const aria = (el.getAttribute('aria-label') || '').toLowerCase();
-                                const role = (el.getAttribute('role') || '').toLowerCase();
-                                const cls = (el.className || '').toLowerCase();
-                                const hint = (ph + ' ' + aria + ' ' + role + ' ' + cls);
-                                if (el.getAttribute('contenteditable') === 'true') {
-                                  const url = (window.location && window.location.href) ? window.location.href.toLowerCase() : '';
-                                  if (url.includes('perplexity.ai')) return true;
-                                  try {
-                                    const r = el.getBoundingClientRect();
-                                    if (r.left > window.innerWidth * 0.18) return true;
-                                  } catch {}
-                                  return false;
-                                }
-                                return /(ask|pregunt|message|follow|seguimiento|solicitar|qué quieres saber|ask anything|type a message|add details)/i.test(hint);
-                              };
-                              const candidates = [...document.querySelectorAll('[contenteditable="true"], textarea, input[type="text"]')];
-                              for (const el of candidates) {
-                                if (!isAssistantField(el)) continue;
-                                const r = el.getBoundingClientRect();
-                                const style = window.getComputedStyle(el);
-                                const visible = r.width > 0 && r.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
-                                if (visible) return true;
-                              }
-                              return false;
-                            })()
-                            """,
-                            timeout_s=4,
-                        )
-                    )
+                    info = self._eval(_INPUT_PROBE_JS, timeout_s=4)
+                    return isinstance(info, dict) and bool(info.get("found"))
                 except Exception:
                     return False
 
@@ -212,6 +829,7 @@ class CometController:
 
                 try:
                     self.cdp.connect(ws_url)
+                    self._on_connected(chosen.get("url"))
                 except Exception as e:
                     msg = str(e)
                     looks_like_allow_origins = (
@@ -227,11 +845,7 @@ class CometController:
                         break
                     raise
 
-                for method in ["Page.enable", "Runtime.enable", "DOM.enable", "Network.enable"]:
-                    try:
-                        self.cdp.call(method, timeout_s=10)
-                    except CDPError:
-                        pass
+                self._setup_session()
 
                 self._active_target_id = chosen.get("id")
                 if has_assistant_input():
@@ -247,7 +861,54 @@ class CometController:
             if restarted:
                 continue
 
+    def _on_connected(self, url: str | None) -> None:
+        # Per-socket state: remote handles die with the old socket, the URL is the target's.
+        self._handles.clear()
+        if self._nav_q is not None:
+            self.cdp.unsubscribe("Page.frameNavigated", self._nav_q)
+        self._current_url = url
+        self._nav_q = self.cdp.subscribe("Page.frameNavigated", maxsize=64)
+
+    def _setup_session(self) -> None:
+        # Pipelined: all frames go out before any reply is awaited. A failure in one step is ignored like
+        # before; the others were already sent. The status scraper is installed for every future document
+        # and for the current one, so polls only send a call to window.__cometStatus.
+        try:
+            self.cdp.call_many(
+                [
+                    *((method, None) for method in _ENABLE_DOMAINS),
+                    ("Runtime.addBinding", {"name": _NOTIFY_BINDING}),
+                    ("Page.addScriptToEvaluateOnNewDocument", {"source": _STATUS_INSTALL_JS}),
+                    ("Runtime.evaluate", {"expression": _STATUS_INSTALL_JS}),
+                ],
+                timeout_s=10,
+            )
+        except CDPError:
+            pass
+
+    def _known_url(self) -> str | None:
+        q = self._nav_q
+        if q is None:
+            return None
+        # A full queue may have dropped the latest navigation, so the URL is no longer trustworthy.
+        overflowed = q.full()
+        while True:
+            try:
+                ev = q.get_nowait()
+            except Empty:
+                break
+            frame = (ev.get("params") or {}).get("frame") or {}
+            if not frame.get("parentId"):
+                self._current_url = str(frame.get("url") or "")
+        if overflowed:
+            self._current_url = None
+        return self._current_url
+
     def ensure_connected(self) -> None:
+        # Any successful reply within the last 2 s (a poll, a target query...) already proves the socket
+        # is alive; skip the probe.
+        if self.cdp.connected and time.monotonic() - self.cdp.last_ok_at < 2.0:
+            return
         try:
             self.cdp.call("Runtime.evaluate", {"expression": "1+1", "returnByValue": True}, timeout_s=3)
         except Exception:
@@ -257,63 +918,22 @@ class CometController:
         self.ensure_connected()
 
         def wait_for_assistant_input(timeout_s: float) -> dict[str, Any]:
-            deadline = time.time() + timeout_s
+            deadline = time.monotonic() + timeout_s
             last_info: dict[str, Any] = {}
-            while time.time() < deadline:
-                info = self._eval(
-                    """
-                    (() => {
-                      const url = window.location.href;
-                      const ready = document.readyState;
-                      const isAssistantField = (el) => {
-                        if (!el) return false;
-                        const ph = (el.getAttribute('placeholder') || '').toLowerCase();
-                        const aria = (el.getAttribute('aria-label') || '').toLowerCase();
-                        const role = (el.getAttribute('role') || '').toLowerCase();
-                        const cls = (el.className || '').toLowerCase();
-                        const hint = (ph + ' ' + aria + ' ' + role + ' ' + cls);
-                        if (el.getAttribute('contenteditable') === 'true') {
-                          const url = (window.location && window.location.href) ? window.location.href.toLowerCase() : '';
-                          if (url.includes('perplexity.ai')) return true;
-                          try {
-                            const r = el.getBoundingClientRect();
-                            if (r.left > window.innerWidth * 0.18) return true;
-                          } catch {}
-                          return false;
-                        }
-                        // Avoid generic page inputs by requiring assistant-like hints
-                        return /(ask|pregunt|message|follow|seguimiento|solicitar|qué quieres saber|ask anything|type a message|add details)/i.test(hint);
-                      };
-
-                      const candidates = [...document.querySelectorAll('[contenteditable="true"], textarea, input[type="text"]')];
-                      let visible = false;
-                      let hint = '';
-                      let inputSel = '';
-                      for (const el of candidates) {
-                        if (!isAssistantField(el)) continue;
-                        const r = el.getBoundingClientRect();
-                        const style = window.getComputedStyle(el);
-                        const isVisible = r.width > 0 && r.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
-                        if (!isVisible) continue;
-                        visible = true;
-                        inputSel = el.getAttribute('contenteditable') === 'true' ? '[contenteditable="true"]' : (el.tagName || '').toLowerCase();
-                        hint = (el.getAttribute('placeholder') || el.getAttribute('aria-label') || '').toString();
-                        break;
-                      }
-                      return { url, ready, found: visible, inputSel, hint };
-                    })()
-                    """,
-                    timeout_s=5,
-                )
+            delays = _backoff()
+            while time.monotonic() < deadline:
+                info = self._eval(_INPUT_PROBE_JS, timeout_s=5)
                 if isinstance(info, dict):
                     last_info = info
                     if info.get("found"):
                         return info
-                time.sleep(0.35)
+                time.sleep(min(next(delays), max(0.0, deadline - time.monotonic())))
             return last_info
 
-        if fresh:
-            # For "new chat", go to Perplexity home to reset UI state.
+        known_url = self._known_url()
+        if fresh or (known_url is not None and _is_internal_url(known_url)):
+            # For "new chat", go to Perplexity home to reset UI state. Internal pages (new tab, settings)
+            # never host the assistant, so skip waiting for an input there.
             self.navigate(self.cfg.perplexity_url, wait_for_load=True)
 
         info = wait_for_assistant_input(timeout_s=10)
@@ -329,11 +949,8 @@ class CometController:
             if not ws_url:
                 raise RuntimeError(f"No pude encontrar el input del asistente. Estado: {json.dumps(info, ensure_ascii=False)}")
             self.cdp.connect(ws_url)
-            for method in ["Page.enable", "Runtime.enable", "DOM.enable", "Network.enable"]:
-                try:
-                    self.cdp.call(method, timeout_s=10)
-                except CDPError:
-                    pass
+            self._on_connected(t.get("url"))
+            self._setup_session()
             info = wait_for_assistant_input(timeout_s=10)
             if not info.get("found"):
                 raise RuntimeError(f"No pude encontrar el input del asistente. Estado: {json.dumps(info, ensure_ascii=False)}")
@@ -341,28 +958,10 @@ class CometController:
         if fresh:
             # Clear any residual text in the assistant input
             self._eval(
-                """
+                _FIND_INPUT_JS
+                + """
                 (() => {
-                  const isAssistantField = (el) => {
-                    if (!el) return false;
-                    const ph = (el.getAttribute('placeholder') || '').toLowerCase();
-                    const aria = (el.getAttribute('aria-label') || '').toLowerCase();
-                    const role = (el.getAttribute('role') || '').toLowerCase();
-                    const cls = (el.className || '').toLowerCase();
-                    const hint = (ph + ' ' + aria + ' ' + role + ' ' + cls);
-                    if (el.getAttribute('contenteditable') === 'true') {
-                      const url = (window.location && window.location.href) ? window.location.href.toLowerCase() : '';
-                      if (url.includes('perplexity.ai')) return true;
-                      try {
-                        const r = el.getBoundingClientRect();
-                        if (r.left > window.innerWidth * 0.18) return true;
-                      } catch {}
-                      return false;
-                    }
-                    return /(ask|pregunt|message|follow|seguimiento|solicitar|qué quieres saber|ask anything|type a message|add details)/i.test(hint);
-                  };
-                  const candidates = [...document.querySelectorAll('[contenteditable="true"], textarea, input[type="text"]')];
-                  const target = candidates.find(isAssistantField);
+                  const target = window.__cometFindInput();
                   if (!target) return false;
                   target.focus();
                   if (target.getAttribute && target.getAttribute('contenteditable') === 'true') {
@@ -380,22 +979,69 @@ class CometController:
 
     def navigate(self, url: str, wait_for_load: bool = True) -> None:
         self.ensure_connected()
-        self.cdp.call("Page.navigate", {"url": url}, timeout_s=10)
-        if wait_for_load:
-            try:
-                self.cdp.wait_for_event("Page.loadEventFired", timeout_s=15)
-            except Exception:
-                pass
+        loaded = self.cdp.subscribe("Page.loadEventFired") if wait_for_load else None
+        try:
+            self.cdp.call("Page.navigate", {"url": url}, timeout_s=10)
+            if loaded is not None:
+                try:
+                    self.cdp.wait_for_event("Page.loadEventFired", timeout_s=15, queue=loaded)
+                except Exception:
+                    pass
+        finally:
+            if loaded is not None:
+                self.cdp.unsubscribe("Page.loadEventFired", loaded)
 
     def _eval(self, expression: str, timeout_s: float = 15.0) -> Any:
         self.ensure_connected()
-        result = self.cdp.call(
-            "Runtime.evaluate",
-            {"expression": expression, "awaitPromise": True, "returnByValue": True},
-            timeout_s=timeout_s,
-        )
+        try:
+            result = self.cdp.call(
+                "Runtime.evaluate",
+                {"expression": expression, "awaitPromise": True, "returnByValue": True},
+                timeout_s=timeout_s,
+            )
+        except CDPError:
+            # Force the next ensure_connected() to probe (and reconnect if needed).
+            self.cdp.last_ok_at = 0.0
+            raise
         return result.get("result", {}).get("value")
 
+    def _call_function(self, declaration: str, *args: Any, receiver: str = "globalThis", timeout_s: float = 15.0) -> Any:
+        # receiver is an expression evaluated once per document; its handle is reused as `this`.
+        self.ensure_connected()
+        params = {
+            "functionDeclaration": declaration,
+            "arguments": [{"value": a} for a in args],
+            "awaitPromise": True,
+            "returnByValue": True,
+        }
+        for attempt in range(2):
+            object_id = self._handles.get(receiver)
+            try:
+                if object_id is None:
+                    # Fetch the receiver, then call on it: two round-trips (the call's layer waits for the
+                    # evaluate reply), but one call_many with no Python-side handling in between.
+                    handle, result = self.cdp.call_many(
+                        [
+                            BatchCall("Runtime.evaluate", {"expression": receiver}),
+                            BatchCall("Runtime.callFunctionOn", params, input_from=0, bind={"objectId": "result.objectId"}),
+                        ],
+                        timeout_s=timeout_s,
+                    )
+                    new_id = handle.get("result", {}).get("objectId")
+                    if new_id:
+                        self._handles[receiver] = new_id
+                else:
+                    result = self.cdp.call("Runtime.callFunctionOn", {**params, "objectId": object_id}, timeout_s=timeout_s)
+            except CDPError as e:
+                # A navigation invalidates the handle; only that case is safe to retry (the call never ran).
+                stale = "Could not find object" in e.message or "Cannot find context" in e.message
+                if object_id is not None and stale and attempt == 0:
+                    self._handles.pop(receiver, None)
+                    continue
+                self.cdp.last_ok_at = 0.0
+                raise
+            return result.get("result", {}).get("value")
+
     def _debug(self, event: str, **fields: Any) -> None:
         if not self._debug_enabled:
             return
@@ -407,513 +1053,48 @@ class CometController:
             pass
 
     def reset_stability(self) -> None:
-        self._last_response_text = ""
-        self._stable_count = 0
+        self._last_response_sig = (0, 0)
+        self._response_changed_at = 0.0
 
     def _update_stability(self, response: str) -> bool:
         if response and len(response) > 50:
-            if response == self._last_response_text:
-                self._stable_count += 1
-            else:
-                self._stable_count = 0
-                self._last_response_text = response
-            return self._stable_count >= self._stability_threshold
+            # (length, hash) instead of the text: no copy of the previous response is kept around.
+            sig = (len(response), hash(response))
+            now = time.monotonic()
+            if sig != self._last_response_sig:
+                self._last_response_sig = sig
+                self._response_changed_at = now
+            return now - self._response_changed_at >= self._stability_s
         return False
 
     def send_prompt(self, prompt: str) -> None:
         self.ensure_connected()
-        prompt_json = json.dumps(prompt)
-        typed = self._eval(
-            """
-            (() => {
-              const prompt = PROMPT_JSON;
-              const isAssistantField = (el) => {
-                if (!el) return false;
-                const ph = (el.getAttribute('placeholder') || '').toLowerCase();
-                const aria = (el.getAttribute('aria-label') || '').toLowerCase();
-                const role = (el.getAttribute('role') || '').toLowerCase();
-                const cls = (el.className || '').toLowerCase();
-                const hint = (ph + ' ' + aria + ' ' + role + ' ' + cls);
-                if (el.getAttribute('contenteditable') === 'true') {
-                  const url = (window.location && window.location.href) ? window.location.href.toLowerCase() : '';
-                  if (url.includes('perplexity.ai')) return true;
-                  try {
-                    const r = el.getBoundingClientRect();
-                    if (r.left > window.innerWidth * 0.18) return true;
-                  } catch {}
-                  return false;
-                }
-                return /(ask|pregunt|message|follow|seguimiento|solicitar|qué quieres saber|ask anything|type a message|add details)/i.test(hint);
-              };
-
-              const candidates = [...document.querySelectorAll('[contenteditable="true"], textarea, input[type="text"]')];
-              const target = candidates.find(el => {
-                if (!isAssistantField(el)) return false;
-                const r = el.getBoundingClientRect();
-                const style = window.getComputedStyle(el);
-                const visible = r.width > 0 && r.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
-                return visible;
-              });
-              if (!target) return { ok: false, reason: 'no assistant input' };
-
-              target.focus();
-
-              // Prefer execCommand for contenteditable (works with React/Vue), fallback to direct assignment + input event
-              if (target.getAttribute && target.getAttribute('contenteditable') === 'true') {
-                try {
-                  document.execCommand('selectAll', false, null);
-                  document.execCommand('insertText', false, prompt);
-                } catch {
-                  target.innerText = '';
-                  target.innerText = prompt;
-                  target.dispatchEvent(new InputEvent('input', { bubbles: true, inputType: 'insertText', data: prompt }));
-                }
-              } else {
-                target.value = prompt;
-                target.dispatchEvent(new Event('input', { bubbles: true }));
-              }
-
-              // Verify content exists
-              const content = (target.getAttribute && target.getAttribute('contenteditable') === 'true')
-                ? (target.innerText || '')
-                : (target.value || '');
-              return { ok: (content.trim().length > 0), len: content.trim().length };
-            })()
-            """.replace("PROMPT_JSON", prompt_json),
-            timeout_s=10,
+        # Type and submit (Enter, then the submit button, then the form) in a single round-trip.
+        result = self._call_function(
+            "function (prompt) { return this(prompt); }", prompt, receiver=_SEND_PROMPT_EXPR, timeout_s=10
         )
-        if not (isinstance(typed, dict) and typed.get("ok") is True):
+        if not (isinstance(result, dict) and result.get("ok") is True):
             raise RuntimeError("No se encontró el input del asistente para escribir el prompt. ¿Está abierto el panel de Perplexity/Asistente?")
-
-        time.sleep(0.6)
-        self._eval(
-            """
-            (() => {
-              const isAssistantField = (el) => {
-                if (!el) return false;
-                const ph = (el.getAttribute('placeholder') || '').toLowerCase();
-                const aria = (el.getAttribute('aria-label') || '').toLowerCase();
-                const role = (el.getAttribute('role') || '').toLowerCase();
-                const cls = (el.className || '').toLowerCase();
-                const hint = (ph + ' ' + aria + ' ' + role + ' ' + cls);
-                if (el.getAttribute('contenteditable') === 'true') {
-                  const url = (window.location && window.location.href) ? window.location.href.toLowerCase() : '';
-                  if (url.includes('perplexity.ai')) return true;
-                  try {
-                    const r = el.getBoundingClientRect();
-                    if (r.left > window.innerWidth * 0.18) return true;
-                  } catch {}
-                  return false;
-                }
-                return /(ask|pregunt|message|follow|seguimiento|solicitar|qué quieres saber|ask anything|type a message|add details)/i.test(hint);
-              };
-              const els = [...document.querySelectorAll('[contenteditable="true"], textarea, input[type="text"]')];
-              const el = els.find(isAssistantField);
-              if (!el) return false;
-              el.focus();
-              const down = new KeyboardEvent('keydown', { key: 'Enter', code: 'Enter', keyCode: 13, which: 13, bubbles: true, cancelable: true });
-              const press = new KeyboardEvent('keypress', { key: 'Enter', code: 'Enter', keyCode: 13, which: 13, bubbles: true, cancelable: true });
-              const up = new KeyboardEvent('keyup', { key: 'Enter', code: 'Enter', keyCode: 13, which: 13, bubbles: true, cancelable: true });
-              el.dispatchEvent(down);
-              el.dispatchEvent(press);
-              el.dispatchEvent(up);
-              return true;
-            })()
-            """,
-            timeout_s=5,
-        )
-
-        time.sleep(0.9)
-        submitted = self._eval(
-            """
-            (() => {
-              const hasLoading = document.querySelector('[class*="animate-spin"], [class*="animate-pulse"], [class*="loading"], [class*="thinking"]') !== null;
-              const body = document.body ? document.body.innerText : '';
-              const hasThinking = body.includes('Thinking') || body.includes('Pensando');
-              const isAssistantField = (el) => {
-                if (!el) return false;
-                const ph = (el.getAttribute('placeholder') || '').toLowerCase();
-                const aria = (el.getAttribute('aria-label') || '').toLowerCase();
-                const role = (el.getAttribute('role') || '').toLowerCase();
-                const cls = (el.className || '').toLowerCase();
-                const hint = (ph + ' ' + aria + ' ' + role + ' ' + cls);
-                if (el.getAttribute('contenteditable') === 'true') {
-                  const url = (window.location && window.location.href) ? window.location.href.toLowerCase() : '';
-                  if (url.includes('perplexity.ai')) return true;
-                  try {
-                    const r = el.getBoundingClientRect();
-                    if (r.left > window.innerWidth * 0.18) return true;
-                  } catch {}
-                  return false;
-                }
-                return /(ask|pregunt|message|follow|seguimiento|solicitar|qué quieres saber|ask anything|type a message|add details)/i.test(hint);
-              };
-              const els = [...document.querySelectorAll('[contenteditable="true"], textarea, input[type="text"]')];
-              const el = els.find(isAssistantField);
-              let cleared = false;
-              if (el) {
-                const content = (el.getAttribute && el.getAttribute('contenteditable') === 'true')
-                  ? (el.innerText || '')
-                  : (el.value || '');
-                cleared = content.trim().length < 2;
-              }
-              return cleared || hasLoading || hasThinking;
-            })()
-            """
-        )
-        if submitted:
-            return
-
-        clicked = self._eval(
-            """
-            (() => {
-              const selectors = [
-                'button[aria-label*="Submit"]',
-                'button[aria-label*="Send"]',
-                'button[aria-label*="Ask"]',
-                'button[type="submit"]',
-              ];
-              for (const sel of selectors) {
-                const btn = document.querySelector(sel);
-                if (btn && !btn.disabled && btn.offsetParent !== null) {
-                  btn.click();
-                  return true;
-                }
-              }
-              // Position-based fallback: rightmost visible button near input
-              const inputEl = document.querySelector('[contenteditable="true"]') ||
-                              document.querySelector('textarea') ||
-                              document.querySelector('input[type="text"]');
-              if (inputEl) {
-                let parent = inputEl.parentElement;
-                const candidates = [];
-                for (let i = 0; i < 6 && parent; i++) {
-                  for (const btn of parent.querySelectorAll('button')) {
-                    if (btn.disabled || btn.offsetParent === null) continue;
-                    const rect = btn.getBoundingClientRect();
-                    if (rect.width <= 0 || rect.height <= 0) continue;
-                    const aria = (btn.getAttribute('aria-label') || '').toLowerCase();
-                    const txt = (btn.innerText || '').toLowerCase();
-                    if (aria.includes('search') || aria.includes('research') || aria.includes('labs') || aria.includes('learn')) continue;
-                    if (aria.includes('attach') || aria.includes('voice') || aria.includes('menu') || aria.includes('more')) continue;
-                    if (txt.includes('attach') || txt.includes('voice')) continue;
-                    candidates.push({ btn, x: rect.right, y: rect.top });
-                  }
-                  parent = parent.parentElement;
-                }
-                if (candidates.length) {
-                  candidates.sort((a, b) => b.x - a.x);
-                  candidates[0].btn.click();
-                  return true;
-                }
-              }
-              return false;
-            })()
-            """
-        )
-        if clicked:
-            time.sleep(0.7)
-            second = self._eval(
-                """
-                (() => {
-                  const hasLoading = document.querySelector('[class*="animate-spin"], [class*="animate-pulse"], [class*="loading"], [class*="thinking"]') !== null;
-                  const body = document.body ? document.body.innerText : '';
-                  const hasThinking = body.includes('Thinking') || body.includes('Pensando');
-                  return hasLoading || hasThinking;
-                })()
-                """,
-                timeout_s=5,
-            )
-            if second:
-                return
-
-        # Last resort: try dispatching a submit event
-        self._eval(
-            """
-            (() => {
-              const form = document.querySelector('form');
-              if (form) {
-                form.dispatchEvent(new Event('submit', { bubbles: true, cancelable: true }));
-                return true;
-              }
-              return false;
-            })()
-            """,
-            timeout_s=5,
-        )
+        self._debug("submit", via=result.get("via"), submitted=result.get("submitted"))
 
     def get_agent_status(self) -> AgentStatus:
         self.ensure_connected()
-        payload = self._eval(
-            """
-            (() => {
-              const bodyText = (document.body && document.body.innerText) ? document.body.innerText : '';
-              const pageUrl = window.location.href;
-              const pageTitle = document.title || '';
-
-              // Find the currently visible input (works for perplexity.ai and Comet sidebar assistant)
-              let inputEl = null;
-              let inputSel = '';
-              const isAssistantField = (el) => {
-                if (!el) return false;
-                const ph = (el.getAttribute('placeholder') || '').toLowerCase();
-                const aria = (el.getAttribute('aria-label') || '').toLowerCase();
-                const role = (el.getAttribute('role') || '').toLowerCase();
-                const cls = (el.className || '').toLowerCase();
-                const hint = (ph + ' ' + aria + ' ' + role + ' ' + cls);
-                if (el.getAttribute('contenteditable') === 'true') {
-                  const url = (window.location && window.location.href) ? window.location.href.toLowerCase() : '';
-                  if (url.includes('perplexity.ai')) return true;
-                  try {
-                    const r = el.getBoundingClientRect();
-                    if (r.left > window.innerWidth * 0.18) return true;
-                  } catch {}
-                  return false;
-                }
-                return /(ask|pregunt|message|follow|seguimiento|solicitar|qué quieres saber|ask anything|type a message|add details)/i.test(hint);
-              };
-              const candidates = [...document.querySelectorAll('[contenteditable="true"], textarea, input[type="text"]')];
-              for (const el of candidates) {
-                if (!isAssistantField(el)) continue;
-                const r = el.getBoundingClientRect();
-                const style = window.getComputedStyle(el);
-                const visible = r.width > 0 && r.height > 0 && style.visibility !== 'hidden' && style.display !== 'none';
-                if (!visible) continue;
-                inputEl = el;
-                inputSel = (el.getAttribute('contenteditable') === 'true') ? '[contenteditable="true"]' : (el.tagName || '').toLowerCase();
-                break;
-              }
-
-              // Try to locate the assistant "panel" root around the input (avoids reading the underlying page main content)
-              let root = null;
-              let extractor = 'body';
-              if (inputEl && inputEl.parentElement) {
-                let node = inputEl;
-                let lastPanel = null;
-                for (let i = 0; i < 10 && node; i++) {
-                  node = node.parentElement;
-                  if (!node) break;
-                  const rect = node.getBoundingClientRect();
-                  const isPanelLike =
-                    rect.height > window.innerHeight * 0.45 &&
-                    rect.width > 260 &&
-                    rect.width < window.innerWidth * 0.98 &&
-                    rect.left > window.innerWidth * 0.18;
-                  if (isPanelLike) lastPanel = node;
-                }
-                if (lastPanel) {
-                  root = lastPanel;
-                  extractor = 'panel';
-                }
-              }
-              if (!root) {
-                root = document.querySelector('main') || document.querySelector('[role="main"]') || document.body;
-                extractor = root === document.body ? 'body' : 'main';
-              }
-
-              const scopeText = (root && root.innerText) ? root.innerText : bodyText;
-              const tailText = scopeText.slice(-3000);
-
-              let hasStop = false;
-              for (const btn of document.querySelectorAll('button')) {
-                const aria = (btn.getAttribute('aria-label') || '').toLowerCase();
-                const title = (btn.getAttribute('title') || '').toLowerCase();
-                const testid = (btn.getAttribute('data-testid') || '').toLowerCase();
-                const txt = (btn.innerText || '').toLowerCase();
-                const isStop =
-                  aria.includes('stop') || aria.includes('cancel') ||
-                  title.includes('stop') || title.includes('cancel') ||
-                  testid.includes('stop') ||
-                  aria.includes('detener') || aria.includes('cancelar') ||
-                  title.includes('detener') || title.includes('cancelar') ||
-                  txt === 'stop' || txt === 'detener' || txt === 'cancelar' ||
-                  btn.querySelector('svg rect');
-                if (isStop && btn.offsetParent !== null && !btn.disabled) { hasStop = true; break; }
-              }
-
-              const hasLoading =
-                document.querySelector('[class*="animate-spin"], [class*="animate-pulse"], [class*="loading"], [class*="thinking"]') !== null ||
-                /\\b(thinking|searching|researching|analyzing|loading)\\b/i.test(bodyText) ||
-                /\\b(pensando|buscando|investigando|analizando|cargando)\\b/i.test(bodyText);
-
-              const hasFollowup =
-                bodyText.includes('Ask a follow-up') ||
-                bodyText.includes('Ask follow-up') ||
-                bodyText.includes('Ask anything') ||
-                bodyText.includes('Type a message') ||
-                bodyText.includes('Add details') ||
-                bodyText.includes('Preguntar algo') ||
-                bodyText.includes('Pregunta algo') ||
-                bodyText.includes('Escribe un mensaje') ||
-                bodyText.includes('Añadir detalles') ||
-                bodyText.includes('Agregar detalles') ||
-                bodyText.includes('Pregunta de seguimiento');
-
-              // Detect "omitted" / error states
-              let errorType = '';
-              let errorText = '';
-              // IMPORTANT: only look at the tail of the page so old errors don't trigger on new prompts.
-              if (
-                /respuesta omitida/i.test(tailText) ||
-                /response omitted/i.test(tailText) ||
-                /answer omitted/i.test(tailText) ||
-                /output omitted/i.test(tailText)
-              ) {
-                errorType = 'omitted';
-                errorText = 'Respuesta omitida';
-              } else if (
-                /something went wrong/i.test(tailText) ||
-                /network error/i.test(tailText) ||
-                (/error/i.test(tailText) && /try again|retry/i.test(tailText))
-              ) {
-                errorType = 'retryable_error';
-                errorText = 'Error (reintentar)';
-              }
-
-              let hasRetryButton = false;
-              if (errorType) {
-                for (const btn of document.querySelectorAll('button')) {
-                  if (btn.offsetParent === null || btn.disabled) continue;
-                  const t = ((btn.innerText || '') + ' ' + (btn.getAttribute('aria-label') || '')).toLowerCase();
-                  if (t.includes('try again') || t.includes('retry') || t.includes('regenerate') ||
-                      t.includes('reintentar') || t.includes('intentar de nuevo') || t.includes('regenerar')) {
-                    hasRetryButton = true;
-                    break;
-                  }
-                }
-              }
-
-              let status = 'idle';
-              if (hasStop || hasLoading) status = 'working';
-
-              // Extract response
-              let response = '';
-
-              // Strategy 1: Content after "X steps completed" marker (agentic final answer)
-              const stepsMatch = scopeText.match(/\\d+\\s+(steps?|pasos?)\\s+(completed|completad[oa]s?)/i);
-              if (stepsMatch) {
-                const markerIndex = scopeText.indexOf(stepsMatch[0]);
-                if (markerIndex !== -1) {
-                  let after = scopeText.substring(markerIndex + stepsMatch[0].length).trim();
-                  after = after.replace(/^[>›→\\s]+/, '').trim();
-                  const endMarkers = [
-                    'Ask anything', 'Ask a follow-up', 'Ask follow-up', 'Add details', 'Type a message',
-                    'Preguntar algo', 'Escribe un mensaje', 'Añadir detalles', 'Agregar detalles', 'Pregunta de seguimiento'
-                  ];
-                  let endIndex = after.length;
-                  for (const m of endMarkers) {
-                    const idx = after.indexOf(m);
-                    if (idx !== -1 && idx < endIndex) endIndex = idx;
-                  }
-                  response = after.substring(0, endIndex).trim();
-                }
-              }
-
-              // Strategy 2: Content after "Reviewed X sources" marker
-              if (!response || response.length < 80) {
-                const sourcesMatch = scopeText.match(/Reviewed\\s+\\d+\\s+sources?/i);
-                if (sourcesMatch) {
-                  const markerIndex = scopeText.indexOf(sourcesMatch[0]);
-                  if (markerIndex !== -1) {
-                    let after = scopeText.substring(markerIndex + sourcesMatch[0].length).trim();
-                    const endMarkers = [
-                      'Ask anything', 'Ask a follow-up', 'Ask follow-up', 'Add details', 'Type a message',
-                      'Preguntar algo', 'Escribe un mensaje', 'Añadir detalles', 'Agregar detalles', 'Pregunta de seguimiento'
-                    ];
-                    let endIndex = after.length;
-                    for (const m of endMarkers) {
-                      const idx = after.indexOf(m);
-                      if (idx !== -1 && idx < endIndex) endIndex = idx;
-                    }
-                    response = after.substring(0, endIndex).trim();
-                  }
-                }
-              }
-
-              // Strategy 3: Capture recent content blocks above the input (works well for both perplexity.ai and sidebar UI)
-              if (!response || response.length < 120) {
-                const inputTop = inputEl ? inputEl.getBoundingClientRect().top : Infinity;
-                const blockSelectors = [
-                  '[class*="prose"]',
-                  '[class*="markdown"]',
-                  '[data-testid*="answer"]',
-                  '[data-testid*="message"]',
-                  'article',
-                  '[role="article"]'
-                ];
-                const blocks = [];
-                for (const sel of blockSelectors) {
-                  try { blocks.push(...root.querySelectorAll(sel)); } catch {}
-                }
-                const uniq = [...new Set(blocks)];
-                const candidates = [];
-                for (const el of uniq) {
-                  if (!el) continue;
-                  if (inputEl && el.contains && el.contains(inputEl)) continue;
-                  if (el.closest && el.closest('nav, header, footer')) continue;
-                  const r = el.getBoundingClientRect();
-                  if (r.width <= 0 || r.height <= 0) continue;
-                  if (r.bottom > inputTop - 6) continue; // below or overlapping input area
-                  const text = (el.innerText || '').trim();
-                  if (!text || text.length < 12) continue;
-                  // Skip UI-only small headers
-                  if (/^(perplexity|asistente|enlaces|imágenes|images|links)$/i.test(text)) continue;
-                  candidates.push({ text, top: r.top });
-                }
-                candidates.sort((a, b) => a.top - b.top);
-                const picked = candidates.slice(-10).map(x => x.text);
-                if (picked.length) response = picked.join('\\n\\n');
-              }
-
-              // Strategy 4: Last resort, use scope text (trimmed)
-              if ((!response || response.length < 120) && scopeText) {
-                response = scopeText.trim();
-              }
-
-              // Clean response a bit (UI artifacts)
-              if (response) {
-                response = response
-                  .replace(/View All/gi, '')
-                  .replace(/Show more/gi, '')
-                  .replace(/Ask a follow-up/gi, '')
-                  .replace(/Ask anything\\.*/gi, '')
-                  .replace(/Type a message\\.*/gi, '')
-                  .replace(/Add details\\.*/gi, '')
-                  .replace(/\\n{3,}/g, '\\n\\n')
-                  .trim();
-              }
-
-              // Basic "steps" scraping (best-effort)
-              const steps = [];
-              const stepCandidates = ['Preparing', 'Navigating', 'Clicking', 'Scrolling', 'Reading', 'Extracting', 'Answering'];
-              for (const s of stepCandidates) {
-                if (bodyText.includes(s)) steps.push(s);
-              }
-
-              // Completion heuristic (signal-only; stability handled in Python loop)
-              if (!errorType && !hasStop && !hasLoading && response && response.length > 120 && hasFollowup) status = 'completed';
-              return {
-                status,
-                steps,
-                currentStep: steps.length ? steps[steps.length-1] : '',
-                response,
-                hasStopButton: hasStop,
-                hasLoading,
-                hasFollowup,
-                errorType,
-                errorText,
-                hasRetryButton,
-                pageUrl,
-                pageTitle,
-                extractor,
-                debugTail: tailText.slice(-400),
-                inputSel
-              };
-            })()
-            """
-        )
-        if not isinstance(payload, dict):
-            payload = {}
+        payload = self._call_function(_CALL_STATUS_FN, self._status_sig, self._status_resp_id)
+        if isinstance(payload, dict) and payload.get("missing"):
+            # Preload didn't land (e.g. an old tab from before the session setup): ship the scraper itself.
+            payload = self._call_function(_AGENT_STATUS_FN, self._status_sig, self._status_resp_id)
+        if isinstance(payload, dict) and payload.get("unchanged"):
+            # DOM untouched since the last scrape: reuse it (stability still advances below).
+            payload = self._status_payload
+        else:
+            if not isinstance(payload, dict):
+                payload = {}
+            if payload.get("sameResponse"):
+                # Text identical to the one already held; the page skipped sending it.
+                payload["response"] = self._status_payload.get("response", "")
+            self._status_sig = str(payload.get("sig") or "")
+            self._status_resp_id = str(payload.get("respId") or "")
+            self._status_payload = payload
 
         response = str(payload.get("response") or "").strip()
         is_stable = self._update_stability(response)
@@ -944,7 +1125,7 @@ class CometController:
             status=status,
             steps=steps,
             current_step=current_step,
-            response=response[:8000],
+            response=response,
             has_stop_button=has_stop,
             has_loading=has_loading,
             has_followup_ui=has_followup_ui,
@@ -965,6 +1146,12 @@ class CometController:
                 self._eval(
                     """
                     (() => {
+                      const found = window.__cometRetryBtn;
+                      window.__cometRetryBtn = null;
+                      if (found && found.isConnected && found.offsetParent !== null && !found.disabled) {
+                        found.click();
+                        return true;
+                      }
                       for (const btn of document.querySelectorAll('button')) {
                         if (btn.offsetParent === null || btn.disabled) continue;
                         const t = ((btn.innerText || '') + ' ' + (btn.getAttribute('aria-label') || '')).toLowerCase();
@@ -983,44 +1170,19 @@ class CometController:
         except Exception:
             return False
 
-    def _normalize_prompt(self, prompt: str) -> str:
-        # Similar to example_mcp_comet: collapse bullets/newlines for browser input reliability
-        p = prompt.strip()
-        p = "\n".join(line.lstrip("-*• ").rstrip() for line in p.splitlines())
-        p = " ".join(p.split())
-        return p.strip()
-
-    def _maybe_make_agentic(self, prompt: str) -> str:
-        has_url = "http://" in prompt or "https://" in prompt
-        has_website_ref = any(
-            w in prompt.lower()
-            for w in ["go to", "visit", "navigate", "open", "browse", "check", "look at", "click", "fill", "submit", "login", "sign in"]
-        )
-        has_site_names = any(s in prompt.lower() for s in [".com", ".org", ".io", ".net", ".ai", "website", "webpage", "page", "site"])
-        needs_agentic = has_url or has_website_ref or has_site_names
-        if not needs_agentic:
-            return prompt
-
-        lower = prompt.lower()
-        already_agentic = lower.startswith(("use your browser", "using your browser", "open a browser", "navigate to", "browse to"))
-        if already_agentic:
-            return prompt
-
-        if has_url:
-            # Extract first URL and reframe
-            for token in prompt.split():
-                if token.startswith("http://") or token.startswith("https://"):
-                    url = token
-                    rest = prompt.replace(url, "").strip()
-                    return f"Use your browser to navigate to {url} and {rest or 'tell me what you find there'}"
-        return f"Use your browser to {prompt}"
-
     def ask(self, prompt: str, new_chat: bool = False, timeout_s: float = 120.0) -> str:
+        response = ""
+        for chunk in self.ask_stream(prompt, new_chat=new_chat, timeout_s=timeout_s):
+            response = chunk["response"]
+        return response
+
+    def ask_stream(self, prompt: str, new_chat: bool = False, timeout_s: float = 120.0) -> Iterator[dict[str, Any]]:
+        # Yields {"response": partial, "completed": False} on every change, then one final chunk with completed=True.
         prompt = (prompt or "").strip()
         if not prompt:
             raise ValueError("prompt vacío")
 
-        prompt = self._maybe_make_agentic(self._normalize_prompt(prompt))
+        prompt = _maybe_make_agentic(_normalize_prompt(prompt))
 
         self.reset_stability()
         self.ensure_perplexity_ready(fresh=new_chat)
@@ -1042,26 +1204,75 @@ class CometController:
             baseline_tail=baseline.debug_tail,
         )
 
+        # DOM change notices and streamed responses ending wake the loop early; the adaptive poll stays as
+        # the fallback. Subscribed before sending: the answer stream can start while send_prompt is still
+        # waiting in the page. Subscriptions live on the client, so they survive the reconnects below.
+        events: "Queue[dict[str, Any]]" = Queue(maxsize=256)
+        for method in _PAGE_EVENTS:
+            self.cdp.subscribe(method, queue=events)
         try:
-            self.send_prompt(prompt)
-        except Exception as e:
-            msg = str(e)
-            recoverable = (
-                "No se encontró el input del asistente" in msg
-                or "panel de Perplexity" in msg
-                or "posible fallo al enviar" in msg
-            )
-            if recoverable:
-                self._debug("send_retry", error=msg)
-                self.connect_best_tab()
-                self.ensure_perplexity_ready(fresh=False)
+            try:
                 self.send_prompt(prompt)
-            else:
-                raise
+            except Exception as e:
+                msg = str(e)
+                recoverable = (
+                    "No se encontró el input del asistente" in msg
+                    or "panel de Perplexity" in msg
+                    or "posible fallo al enviar" in msg
+                )
+                if recoverable:
+                    self._debug("send_retry", error=msg)
+                    self.connect_best_tab()
+                    self.ensure_perplexity_ready(fresh=False)
+                    self.send_prompt(prompt)
+                else:
+                    raise
 
-        deadline = time.time() + timeout_s
-        sent_at = time.time()
-        last_activity = time.time()
+            yield from self._poll_answer(baseline_response, events, timeout_s)
+        finally:
+            for method in _PAGE_EVENTS:
+                self.cdp.unsubscribe(method, events)
+
+    def _wait_page_event(
+        self, events: "Queue[dict[str, Any]]", streams: set[str], timeout_s: float, min_wait_s: float = 0.25
+    ) -> str:
+        # "stream_end" as soon as a tracked response stream finishes; "dom" on a mutation notice, but not
+        # before min_wait_s so a busy page can't drive the poll rate up; "" on timeout.
+        start = time.monotonic()
+        deadline = start + timeout_s
+        dom_changed = False
+        while True:
+            now = time.monotonic()
+            if dom_changed and now - start >= min_wait_s:
+                return "dom"
+            remaining = (min(deadline, start + min_wait_s) if dom_changed else deadline) - now
+            if remaining <= 0:
+                return ""
+            try:
+                ev = events.get(timeout=remaining)
+            except Empty:
+                continue
+            method = ev.get("method")
+            params = ev.get("params") or {}
+            if method == "Runtime.bindingCalled":
+                if params.get("name") == _NOTIFY_BINDING:
+                    dom_changed = True
+                continue
+            request_id = str(params.get("requestId") or "")
+            if method == "Network.responseReceived":
+                mime = str((params.get("response") or {}).get("mimeType") or "").lower()
+                if mime.startswith(_STREAM_MIMES):
+                    streams.add(request_id)
+            elif request_id in streams:
+                streams.discard(request_id)
+                return "stream_end"
+
+    def _poll_answer(
+        self, baseline_response: str, events: "Queue[dict[str, Any]]", timeout_s: float
+    ) -> Iterator[dict[str, Any]]:
+        deadline = time.monotonic() + timeout_s
+        sent_at = time.monotonic()
+        last_activity = time.monotonic()
         prev_response = baseline_response
         saw_response = False
         done_candidate_at: float | None = None
@@ -1072,17 +1283,27 @@ class CometController:
         reconnect_attempted = False
         last_debug_at = 0.0
         last_debug_resp_len = -1
-
-        while time.time() < deadline:
+        streams: set[str] = set()
+        # Streams that were open while the response grew; only their end is a done signal, so an early or
+        # unrelated stream can't complete an interim answer.
+        answer_streams: set[str] = set()
+        stream_ended = False
+
+        while time.monotonic() < deadline:
+            tick_at = time.monotonic()
             st = self.get_agent_status()
             if st.has_loading or st.has_stop_button:
                 seen_working = True
 
             if st.response and st.response != prev_response:
                 prev_response = st.response
-                last_activity = time.time()
+                last_activity = time.monotonic()
                 saw_response = True
                 done_candidate_at = None
+                if streams:
+                    answer_streams |= streams
+                    stream_ended = False
+                yield {"response": st.response, "completed": False}
                 if self._debug_enabled:
                     self._debug(
                         "response_update",
@@ -1092,7 +1313,7 @@ class CometController:
                         page_url=st.page_url,
                     )
 
-            now = time.time()
+            now = time.monotonic()
             if self._debug_enabled and (now - last_debug_at) >= 1.0:
                 resp_len = len(st.response or "")
                 if resp_len != last_debug_resp_len or st.status != "working" or st.error_type:
@@ -1118,25 +1339,28 @@ class CometController:
             if st.error_type and should_consider_error:
                 if st.has_retry_button and self.click_retry():
                     self.reset_stability()
+                    # The failed attempt's streams must not count as the regenerated answer finishing.
+                    stream_ended = False
+                    streams.clear()
+                    answer_streams.clear()
                     prev_response = ""
                     saw_response = False
                     done_candidate_at = None
                     done_candidate_response = ""
-                    last_activity = time.time()
+                    last_activity = time.monotonic()
                     seen_working = False
                     time.sleep(1.0)
                     continue
                 raise RuntimeError(f"Perplexity devolvió '{st.error_text or st.error_type}'.")
 
             # If nothing seems to start (common on first send / new chat), try one resubmit.
-            if not seen_working and not saw_response and not resubmit_attempted and (time.time() - sent_at) > 6:
+            if not seen_working and not saw_response and not resubmit_attempted and (time.monotonic() - sent_at) > 6:
                 try:
                     self._eval(
-                        """
+                        _FIND_INPUT_JS
+                        + """
                         (() => {
-                          const el = document.querySelector('[contenteditable="true"]') ||
-                                     document.querySelector('textarea') ||
-                                     document.querySelector('input[type="text"]');
+                          const el = window.__cometFindInput();
                           if (!el) return false;
                           el.focus();
                           const down = new KeyboardEvent('keydown', { key: 'Enter', code: 'Enter', keyCode: 13, which: 13, bubbles: true, cancelable: true });
@@ -1144,6 +1368,13 @@ class CometController:
                           const up = new KeyboardEvent('keyup', { key: 'Enter', code: 'Enter', keyCode: 13, which: 13, bubbles: true, cancelable: true });
                           el.dispatchEvent(up);
 
+                          // Submit button learned by send_prompt on this page, if it is still there.
+                          let hinted = null;
+                          try { hinted = window.__cometSubmitSel ? document.querySelector(window.__cometSubmitSel) : null; } catch {}
+                          if (hinted && !hinted.disabled && hinted.offsetParent !== null) {
+                            hinted.click();
+                            return true;
+                          }
                           const selectors = [
                             'button[aria-label*="Submit"]',
                             'button[aria-label*="Send"]',
@@ -1167,7 +1398,7 @@ class CometController:
                 resubmit_attempted = True
 
             # If we're stuck (no new response, no loading), try reconnecting once (often wrong tab on first connect).
-            if not reconnect_attempted and not saw_response and not seen_working and (time.time() - sent_at) > 15:
+            if not reconnect_attempted and not saw_response and not seen_working and (time.monotonic() - sent_at) > 15:
                 reconnect_attempted = True
                 self._debug("reconnect", reason="no_progress_15s")
                 try:
@@ -1180,26 +1411,45 @@ class CometController:
             idle_s = now - last_activity
 
             # Candidate "done" conditions (don't return immediately; confirm with grace window)
-            is_done_signal = (
-                st.status == "completed"
-                or (st.is_stable and len(st.response) > 120)
-                or (idle_s > 8 and len(st.response) > 200)
+            resp_len = len(st.response)
+            flags = (
+                (st.status == "completed") * _F_COMPLETED
+                | (stream_ended and not streams) * _F_STREAM_DONE
+                | (st.is_stable and resp_len > 120) * _F_STABLE
+                | (idle_s > 8 and resp_len > 200) * _F_IDLE
+                | (saw_response and resp_len > 0) * _F_RESPONSE
+                | (st.has_stop_button or st.has_loading) * _F_BUSY
             )
-            if saw_response and st.response and not st.has_stop_button and not st.has_loading and is_done_signal:
+            if flags in _DONE_MASKS:
                 if done_candidate_at is None or done_candidate_response != st.response:
                     done_candidate_at = now
                     done_candidate_response = st.response
                 elif now - done_candidate_at >= grace_s:
-                    return st.response
+                    yield {"response": st.response, "completed": True}
+                    return
             else:
                 done_candidate_at = None
 
-            time.sleep(1.0)
+            # Sample fast while the answer is moving, back off as the page goes quiet.
+            if st.has_stop_button or idle_s < 2:
+                poll_s = 0.15
+            elif idle_s < 10:
+                poll_s = 0.5
+            else:
+                poll_s = 1.0
+            # The interval runs from the start of this tick, so the scrape's round-trip is part of it rather
+            # than added on top. A short floor keeps the event queue drained.
+            wait_s = max(0.05, poll_s - (time.monotonic() - tick_at))
+            if self._wait_page_event(events, streams, wait_s, min_wait_s=min(0.25, wait_s)) == "stream_end":
+                if answer_streams and not answer_streams & streams:
+                    stream_ended = True
+                    answer_streams.clear()
 
         # timeout: return best effort
         st = self.get_agent_status()
         if not saw_response and not seen_working:
             raise RuntimeError("No se detectó actividad ni respuesta nueva (posible fallo al enviar el prompt).")
         if st.response and (saw_response or st.response != baseline_response):
-            return st.response
+            yield {"response": st.response, "completed": True}
+            return
         raise RuntimeError("Timeout sin respuesta.")
@@ -124,6 +124,12 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.status = QtWidgets.QLabel("Listo.")
         layout.addWidget(self.status)
+        # Worker status updates are coalesced: only the latest one within 50 ms reaches the label.
+        self._pending_status = ""
+        self._status_timer = QtCore.QTimer(self)
+        self._status_timer.setSingleShot(True)
+        self._status_timer.setInterval(50)
+        self._status_timer.timeout.connect(self._flush_status)
 
         self.output = QtWidgets.QPlainTextEdit()
         self.output.setReadOnly(True)
@@ -150,16 +156,25 @@ class MainWindow(QtWidgets.QMainWindow):
         if not prompt:
             return
         self.send_btn.setEnabled(False)
+        self._status_timer.stop()
         self.status.setText("Iniciando…")
         self.output.appendPlainText(f"> {prompt}\n")
 
         self.worker = AskWorker(self.comet, prompt, bool(self.new_chat.isChecked()))
-        self.worker.status_text.connect(self.status.setText)
+        self.worker.status_text.connect(self._queue_status)
         self.worker.response_ready.connect(self._on_response)
         self.worker.error_text.connect(self._on_error)
         self.worker.finished.connect(lambda: self.send_btn.setEnabled(True))
         self.worker.start()
 
+    def _queue_status(self, text: str) -> None:
+        self._pending_status = text
+        if not self._status_timer.isActive():
+            self._status_timer.start()
+
+    def _flush_status(self) -> None:
+        self.status.setText(self._pending_status)
+
     def _on_response(self, text: str) -> None:
         cleaned = text.strip()
         self.output.appendPlainText(cleaned + "\n")
@@ -168,6 +183,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.output.appendPlainText("===COMPLETED===\n")
 
     def _on_error(self, text: str) -> None:
+        # A queued status must not overwrite the error.
+        self._status_timer.stop()
         self.status.setText("Error")
         print(f"[error] {text}", flush=True)
         QtWidgets.QMessageBox.critical(self, "Error", text)